@@ -14,7 +14,8 @@ def login():
         user = current_app.mongo.db.users.find_one({'username': username})
         if user and check_password_hash(user['password'], password):
             session['username'] = username
-            return redirect(url_for('start'))
+            session['role'] = user.get('role', 'user')
+            return redirect(url_for('main.start'))
         flash('Invalid username or password.', 'danger')
     return render_template('login.html', form=form)
 
@@ -22,6 +23,7 @@ def login():
 @login_required
 def logout():
     session.pop('username', None)
+    session.pop('role', None)
     return redirect(url_for('accounts.login'))
 
 @accounts_bp.route('/change-password', methods=['GET', 'POST'])
@@ -43,5 +45,5 @@ def change_password():
             hashed = generate_password_hash(new_password)
             current_app.mongo.db.users.update_one({'username': username}, {'$set': {'password': hashed}})
             flash('Password changed successfully.', 'success')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
     return render_template('change_password.html', form=form)
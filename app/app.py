@@ -1,578 +1,86 @@
 import os
-import io
-import csv
-import json
-from openpyxl import load_workbook
-from weasyprint import HTML
+import logging
 from dotenv import load_dotenv
-from decouple import config
-
-from flask import send_file, Response, request, redirect, url_for, flash, session, current_app
-from flask import Flask, render_template, make_response
-from flask_bcrypt import Bcrypt
-from flask_login import LoginManager
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
-
-from werkzeug.utils import secure_filename
 
+from flask import Flask
 from flask_pymongo import PyMongo
 
-import pandas as pd
-from schedule import TeacherSchedule
-from utils import get_file, allowed_file, create_folder, style_excel_output, set_alternating_column_background, insert_excel_rows, set_size, login_required
-
-from accounts.views import accounts_bp
+from schedule_cache import ScheduleCache
+from jobs import JobQueue
+from uploads import UploadStore
+from utils import create_folder
+from metrics import init_metrics
+from logs import configure_logging
 
 load_dotenv()
 load_dotenv(dotenv_path='.env.prod.db')
 
-app = Flask(__name__)
-app.config.from_object("config.Config")
-app.secret_key = os.getenv("SECRET_KEY")
-
 project_path = os.path.dirname(os.path.realpath(__file__))
-print(f"Project path: {project_path}")
-print(f"UPLOAD_FOLDER: {os.getenv('UPLOAD_FOLDER')}")
 
-@app.context_processor
-def inject_breadcrumb():
-    return dict(uploaded_filename=session.get('uploaded_filename'))
-
-
-upload_folder = os.path.join(project_path, os.getenv("UPLOAD_FOLDER"))
-app.config["UPLOAD_FOLDER"] = upload_folder
+logger = logging.getLogger(__name__)
 
 #############################
 # Mongo database
 #############################
 
-# MongoDB connection setup
-app.config['MONGO_URI'] = 'mongodb://mongo:27017/teacherapp'
-mongo = PyMongo(app)
-
-# Make Mongo available globally
-app.mongo = mongo
+# connected in create_app, views reach it as current_app.mongo
+mongo = PyMongo()
 
 
-############################
-# user handling
-############################
+def create_app(config_object="config.Config"):
+    app = Flask(__name__)
+    app.config.from_object(config_object)
+    app.secret_key = os.getenv("SECRET_KEY")
 
-# Registering acount blueprint
+    configure_logging(app)
+    logger.info("Project path: %s, UPLOAD_FOLDER: %s", project_path, os.getenv("UPLOAD_FOLDER"))
 
-app.register_blueprint(accounts_bp)
+    upload_folder = os.path.join(project_path, os.getenv("UPLOAD_FOLDER"))
+    app.config["UPLOAD_FOLDER"] = upload_folder
+    create_folder(upload_folder)
 
+    init_metrics(app)
 
-############################
-# schedule configs
-############################
+    mongo.init_app(app)
+    # Make Mongo available globally
+    app.mongo = mongo
 
+    ############################
+    # schedule configs
+    ############################
 
-
-ALLOWED_EXTENSIONS = {"xls", "xlsx"}
-
-create_folder(upload_folder)
-
-
-
-#############################
-# routes
-#############################
-
-@app.route('/')
-def index():
-    if 'username' in session:
-        return render_template("index.html")
-    return redirect(url_for('accounts.login'))
-
-@app.route("/start")
-@login_required
-def start():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("Keine Datei hochgeladen", "warning")
-        return redirect(url_for('upload_file'))
-    ts = TeacherSchedule(filepath) 
-    class_names = ts.get_classes()
-    teacher_names = ts.get_df().index.tolist()
-    return render_template("start.html", classes=class_names, teachers=teacher_names)
-
-
-@app.route("/upload", methods=["GET", "POST"])
-@login_required
-def upload_file():
-    if request.method == "POST":
-        file = request.files.get("file")
-        if file and allowed_file(file.filename, ALLOWED_EXTENSIONS):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-            print(f"Saving file to: {filepath}")
-            file.save(filepath)
-
-            session['uploaded_filename'] = filename
-            session['uploaded_file'] = filepath 
-
-            flash("Upload successful!", "success")
-            return redirect(url_for("start"))
-        else:
-            flash("Invalid file type. Please upload an Excel file.", "danger")
-            return redirect(url_for("upload_file"))
-
-    return render_template("upload.html")
-
-
-@app.route("/class/<cls>")
-@login_required
-def show_class(cls):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    records = ts.get_teachers_in_class(cls)
-    main_teachers_for_class = ts.class_teachers.get(cls, {})
-    main_teacher = main_teachers_for_class.get("main")
-    deputies = main_teachers_for_class.get("deputies", [])
-    return render_template(
-        "class.html", 
-        class_name=cls, 
-        table=records,
-        main_teacher=main_teacher,
-        deputies=deputies,
+    # uploaded workbooks, stored once per content
+    app.uploads = UploadStore(
+        upload_folder, versions_kept=app.config["UPLOAD_VERSIONS_KEPT"], grace_period=app.config["UPLOAD_GC_GRACE"]
     )
 
+    # parsed schedules are shared between requests of this process
+    app.schedule_cache = ScheduleCache(max_entries=app.config["SCHEDULE_CACHE_SIZE"])
 
-@app.route("/teacher/<name>")
-@login_required
-def show_teacher(name):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    records = ts.get_classes_of_teacher(name)
-    total = ts.get_total_lessons(name)
-    load = ts.get_teaching_load(name)
-    compare = ts.compare_load(name)
-    return render_template(
-        "teacher.html",
-        teacher_name=name,
-        table=records,
-        total=total,
-        load=load,
-        compare=compare,
+    # heavy exports run as background jobs, their results are kept on disk
+    app.export_jobs = JobQueue(
+        os.path.join(upload_folder, "jobs"),
+        processes=max(1, app.config["EXPORT_PROCESSES"]),
+        retention=app.config["JOB_RETENTION"],
     )
 
+    # uploaded workbooks are parsed, checked and precomputed by a job as well
+    app.ingest_jobs = JobQueue(os.path.join(upload_folder, "jobs"), processes=app.export_jobs.processes)
 
-@app.route("/teacher/<name>/load")
-@login_required
-def show_teacher_load(name):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    data = ts.compare_load(name)
-
-    # Optional: enrich with anr and bonus separately
-    meta = ts.get_teaching_load(name)
-    data["dep"] = meta.get("Deputat 24/25", 0)
-    data["anr"] = meta.get("Anr", 0)
-    data["bonus"] = meta.get("Bonus", 0)
-    data["sonderaufgaben"] = meta.get("Sonderaufgaben", '')
-    data["agsstd"] = meta.get("Ags-Std", 0)
-    data['ags'] = meta.get("Ags-AG", '')
-    data["poolstd"] = meta.get("Poolstd-Std", 0)
-    data['pool'] = meta.get("Poolstd-Bg", '')
-
-    return render_template("teacher_load.html", data=data)
-
-
-@app.route("/teacher/load/export/excel")
-@login_required
-def export_teacher_load_excel():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        for name in ts.get_df().index:
-            data = ts.compare_load(name)
-            meta = ts.get_teaching_load(name)
-
-            # Build export data
-            meta_data = {
-                "Deputat": meta.get("Deputat 24/25", 0),
-                "Anr": meta.get("Anr", 0),
-                "Bonus": meta.get("Bonus", 0),
-                "Sonderaufgaben": meta.get("Sonderaufgaben", ''),
-                "Ags-Std": meta.get("Ags-Std", 0),
-                "Ags-AG": meta.get("Ags-AG", ''),
-                "Poolstd-Std": meta.get("Poolstd-Std", 0),
-                "Poolstd-Bg": meta.get("Poolstd-Bg", ''),
-                "Deputat (net)": data.get('expected', 0),
-                "WS": data.get('assigned', 0),
-                "Bonus (Zukunft)": data.get('delta', 0),
-            }
-            
-            # Transpose meta data
-            result_df = pd.DataFrame.from_dict(meta_data, orient='index', columns=['Stunden'])
-            result_df = result_df.reset_index().rename(columns={"index": "Aufgabe"})
-
-            # move Sonderaufgaben, Ags-Std and Poolstd-Std to a separate column
-            def get_description(row):
-                if row["Aufgabe"] == "Anr":
-                    return meta_data.get("Sonderaufgaben", "")
-                elif row["Aufgabe"] == "Ags-Std":
-                    return meta_data.get("Ags-AG", "")
-                elif row["Aufgabe"] == "Poolstd-Std":
-                    return meta_data.get("Poolstd-Bg", "")
-                return ""
-
-            result_df["Beschreibung"] = result_df.apply(get_description, axis=1)
-            rows_to_remove = ["Sonderaufgaben", "Ags-AG", "Poolstd-Bg"]
-            result_df = result_df[~result_df["Aufgabe"].isin(rows_to_remove)]
-
-            # Combine meta + load
-            # result_df = pd.concat([meta_df, pd.DataFrame([df])], axis=1)
-            # result_df =  meta_df.T.reset_index()
-            # result_df.columns = ["Aufgabe", "Stunden"]
-            sheet_name = name
-            result_df.to_excel(writer, sheet_name=sheet_name[:31], index=False)  # max Excel sheet name length is 31
-            ws = writer.sheets[sheet_name]
-            style_excel_output(writer.book, sheet_name, result_df.columns.tolist(), highlight_cell={'row': 'Bonus (Zukunft)', 'column': 'Stunden'})
-            insert_excel_rows(ws, name, 2)
-            set_size(ws, orientation="landscape")
-
-
-    output.seek(0)
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="teachers_loads.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
-
-@app.route("/dashboard")
-@login_required
-def dashboard():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    rows = ts.get_dashboard_rows()
-    return render_template("dashboard.html", rows=rows)
-
-
-@app.route("/export/dashboard/csv")
-@login_required
-def export_dashboard_csv():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    rows = ts.get_dashboard_rows()
-    if not rows:
-        return "No data to export", 400
-
-    column_order = ["teacher", "dep", "anr", "bonus", "expected", "assigned", "delta"]
-    column_labels = [
-        "Lehrer*in",
-        "Deputat",
-        "Anr",
-        "Bonus",
-        "Ags-Std",
-        "Poolstd-Std",
-        "Deputat (net)",
-        "WS",
-        "Delta",
-    ]
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(column_labels)
-    for row in rows:
-        writer.writerow(
-            [
-                row.get("teacher", ""),
-                row.get("dep", ""),
-                row.get("anr", ""),
-                row.get("bonus", ""),
-                row.get("ags", ""),
-                row.get("pool", ""),
-                row.get("expected", ""),
-                row.get("assigned", ""),
-                row.get("delta", ""),
-            ]
-        )
-    output.seek(0)
-
-    return Response(
-        output,
-        mimetype="text/csv",
-        headers={"Content-Disposition": "attachment; filename=teacher_dashboard.csv"},
-    )
-
-@app.route("/export/dashboard/excel")
-@login_required
-def export_dashboard_excel():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
+    ############################
+    # blueprints
+    ############################
 
-    ts = TeacherSchedule(filepath)
-    teacher_names = ts.get_df().index.tolist()
-    rows = []
+    from accounts import accounts_bp
+    from main import main_bp
 
-    for name in teacher_names:
-        load = ts.compare_load(name)
-        meta = ts.get_teaching_load(name)
-        load["Lehrer*in"] = name
-        load["Deputat"] = meta.get("Deputat 24/25", 0)
-        load["Anr"] = meta.get("Anr", 0)
-        load["Bonus"] = meta.get("Bonus", 0)
-        load["Ags"] = meta.get("Ags-Std", 0)
-        load["Poolstd"] = meta.get("Poolstd-Std", 0)
-        load["Sonderaufgaben"] = meta.get("Sonderaufgaben", "")
-        rows.append(load)
+    app.register_blueprint(accounts_bp)
+    app.register_blueprint(main_bp)
+    return app
 
-    df_export = pd.DataFrame(rows)
-
-    # Optional: specify column order
-    columns = [
-        "Lehrer*in", "Deputat", "Anr", "Bonus", "Ags", "Poolstd", "Sonderaufgaben",
-        "expected", "assigned", "delta"
-    ]
-    df_export = df_export[columns]
-
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_export.to_excel(writer, index=False, sheet_name="Dashboard")
-
-    output.seek(0)
-
-    wb = load_workbook(output)
-    wb = style_excel_output(wb, "Dashboard", columns, highlight_column='delta')
-
-    styled_output = io.BytesIO()
-    wb.save(styled_output)
-    styled_output.seek(0)
-
-    return send_file(
-        styled_output,
-        download_name="dashboard.xlsx",
-        as_attachment=True,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
-@app.route("/export/class/<cls>.csv")
-@login_required
-def export_class_csv(cls):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    df = ts.get_df(reset_index=True)
-    subset = ts.get_teachers_in_class(cls)
-    if not subset:
-        return "No data", 404
-
-    export_df = pd.DataFrame(subset)
-    output = io.StringIO()
-    export_df.to_csv(output, index=False)
-    output.seek(0)
-
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        download_name=f"{cls}.csv",
-        as_attachment=True,
-    )
-
-
-@app.route("/export/teacher/<name>.csv")
-@login_required
-def export_teacher_csv(name):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    subset = ts.get_classes_of_teacher(name)
-    if not subset:
-        return "No data", 404
-
-    export_df = pd.DataFrame(subset)
-    output = io.StringIO()
-    export_df.to_csv(output, index=False)
-    output.seek(0)
-
-    return send_file(
-        io.BytesIO(output.getvalue().encode()),
-        download_name=f"{name}.csv",
-        as_attachment=True,
-    )
-
-
-@app.route("/summary")
-@login_required
-def class_summary():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    sort = request.args.get("sort", "teacher") 
-    print("sort:", sort)
-    df_list = ts.build_wide_class_table(sort)
-    if request.headers.get("HX-Request"):
-        print("HX-Request")
-        return render_template("partials/_class_summary_table.html", table_list=df_list, sort=sort)
-    return render_template("class_summary.html", table_list=df_list, sort=sort)
-
-
-@app.route("/summary/export/", defaults={'sort': 'teacher'})
-@app.route("/summary/export/<sort>")
-@login_required
-def export_summary_csv(sort):
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    df = ts.build_wide_class_table(sort)
-    csv_data = io.StringIO()
-    df.to_csv(csv_data, index=False)
-    csv_data.seek(0)
-    return send_file(
-        io.BytesIO(csv_data.getvalue().encode("utf-8")),
-        mimetype="text/csv",
-        as_attachment=True,
-        download_name="teacher_class_summary.csv",
-    )
-
-from flask import send_file
-import io
-
-@app.route("/summary/export/excel/")
-@login_required
-def export_summary_excel():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    sort = request.args.get("sort", "teacher") 
-    print("sort:", sort)
-    tables_by_grade = ts.build_wide_class_table(sort)
-    output = io.BytesIO()
-
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for table in tables_by_grade:
-            grade = table['grade']
-            df = table['df']
-            sheet_name=f"Stufe {grade}"
-            df.to_excel(writer, sheet_name=sheet_name, index=False)
-            ws = writer.book[sheet_name]
-            style_excel_output(writer.book, sheet_name, df.columns.tolist())
-            set_alternating_column_background(ws, start_row=2, step=3)
-
-    output.seek(0)
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name="class_tables.xlsx",
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    )
-
-
-@app.route("/summary/export/pdf")
-@login_required
-def export_summary_pdf():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    sort = request.args.get("sort", "teacher") 
-
-    grade_tables = ts.build_wide_class_table(sort)  # list of {'grade': '5', 'df': DataFrame}
-
-    rendered = render_template("pdf_export.html", grade_tables=grade_tables)
-    pdf_file = io.BytesIO()
-    HTML(string=rendered).write_pdf(pdf_file)
-
-    pdf_file.seek(0)
-    response = make_response(pdf_file.read())
-    response.headers["Content-Type"] = "application/pdf"
-    response.headers["Content-Disposition"] = "inline; filename=alle_klassenstufen.pdf"
-    return response
-
-@app.route("/export/schedule.csv")
-@login_required
-def export_schedule_csv():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    long_df = ts.get_teacher_schedule_long()  # Your method to get long format DataFrame
-
-    # Convert DataFrame to CSV string
-    csv_buffer = io.StringIO()
-    long_df.to_csv(csv_buffer, index=False)
-
-    # Create a Flask Response with CSV
-    return Response(
-        csv_buffer.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-disposition": "attachment; filename=teacher_schedule.csv"}
-    )
-
-@app.route("/export/schedule.xlsx")
-@login_required
-def export_schedule_xlsx():
-    filepath = session.get('uploaded_file')
-    if not filepath or not os.path.exists(filepath):
-        flash("No file uploaded yet.", "warning")
-        return redirect(url_for('upload_file'))
-
-    ts = TeacherSchedule(filepath)
-    long_df = ts.get_teacher_schedule_long()  # Your method to get long format DataFrame
-
-    # Convert DataFrame to Excel file
-    excel_buffer = io.BytesIO()
-    with pd.ExcelWriter(excel_buffer) as writer:
-        long_df.to_excel(writer, index=False)
-
-    # Create a Flask Response with Excel file
-    return Response(
-        excel_buffer.getvalue(),
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-disposition": "attachment; filename=teacher_schedule.xlsx"}
-    )
 
+# gunicorn serves app:app
+app = create_app()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,5 @@
+# Version of the cleaning logic in TeacherSchedule, kept apart from schedule.py so
+# that modules storing cleaned data can check it without importing pandas.
+
+# bump whenever the cleaning logic changes, snapshots, stored schedules and export jobs are rebuilt then
+CLEANING_VERSION = 1
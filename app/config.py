@@ -8,4 +8,44 @@ class Config(object):
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite://")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     STATIC_FOLDER = f"{os.getenv('APP_FOLDER')}/project/static"
-    MEDIA_FOLDER = f"{os.getenv('APP_FOLDER')}/project/media"
\ No newline at end of file
+    MEDIA_FOLDER = f"{os.getenv('APP_FOLDER')}/project/media"
+
+    MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017/teacherapp")
+
+    # number of parsed schedules kept in memory per process, every gunicorn worker holds its own
+    SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", 8))
+
+    # worker processes for export jobs (at least one is started), the default of one
+    # keeps PDF_SPLIT_GRADES from taking effect
+    EXPORT_PROCESSES = int(os.getenv("EXPORT_PROCESSES", 1))
+
+    # seconds an export request waits for its job before it shows the progress page
+    EXPORT_JOB_WAIT = float(os.getenv("EXPORT_JOB_WAIT", 2))
+
+    # seconds finished jobs and their results are kept, older ones are removed with unused uploads
+    JOB_RETENTION = int(os.getenv("JOB_RETENTION", 7 * 24 * 3600))
+
+    # uploads kept per user (the session's workbook and the ones before it) and seconds
+    # an upload nobody refers to any more is kept before it is removed
+    UPLOAD_VERSIONS_KEPT = int(os.getenv("UPLOAD_VERSIONS_KEPT", 3))
+    UPLOAD_GC_GRACE = int(os.getenv("UPLOAD_GC_GRACE", 3600))
+
+    # seconds an upload waits for its ingestion job before it shows the progress page
+    INGEST_JOB_WAIT = float(os.getenv("INGEST_JOB_WAIT", 2))
+
+    # lay out the summary PDF per grade in parallel. Only used with EXPORT_PROCESSES > 1 and
+    # pypdf installed, so it is off with the default single export process
+    PDF_SPLIT_GRADES = os.getenv("PDF_SPLIT_GRADES", "true").lower() == "true"
+
+    # level of all loggers, LOG_LEVELS overrides single modules ("schedule=DEBUG,snapshot=WARNING")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+
+    # share of parsed DataFrames dumped at debug level, e.g. 0.01 for every hundredth
+    LOG_FRAME_SAMPLE_RATE = float(os.getenv("LOG_FRAME_SAMPLE_RATE", 0))
+
+    # number of request profiles kept in UPLOAD_FOLDER/profiles
+    PROFILES_KEEP = int(os.getenv("PROFILES_KEEP", 50))
+
+    # bearer token for scraping /metrics, without it only admins can see them
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
@@ -0,0 +1,223 @@
+import io
+import re
+from copy import copy
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ERROR_CODES
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+
+
+def convert_cell(value):
+    """Convert an openpyxl cell value the way pandas.read_excel does."""
+    if value is None:
+        return ""
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        as_int = int(value)
+        if as_int == value:
+            return as_int
+        return float(value)
+    return value
+
+
+def read_sheet_rows(excel_path, sheet_index=0):
+    """
+    Read a worksheet once into a list of equally long rows of converted values.
+    Trailing empty cells and rows are trimmed like pandas.read_excel does.
+    """
+    wb = load_workbook(excel_path, read_only=True, data_only=True, keep_links=False)
+    try:
+        ws = wb.worksheets[sheet_index]
+        ws.reset_dimensions()
+
+        rows = []
+        last_row_with_data = -1
+        for row_number, row in enumerate(ws.iter_rows(values_only=True)):
+            converted_row = [convert_cell(value) for value in row]
+            while converted_row and converted_row[-1] == "":
+                converted_row.pop()
+            if converted_row:
+                last_row_with_data = row_number
+            rows.append(converted_row)
+    finally:
+        wb.close()
+
+    rows = rows[: last_row_with_data + 1]
+    if rows:
+        max_width = max(len(row) for row in rows)
+        rows = [row + [""] * (max_width - len(row)) for row in rows]
+    return rows
+
+
+def _fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type="solid")
+
+
+HEADER_FILL = _fill("D9E1F2")
+HEADER_FONT = Font(bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal="center")
+HEADER_BORDER = Border(*(Side(style="thin"),) * 4)  # left, right, top, bottom as pandas writes it
+TITLE_FONT = Font(bold=True)
+POSITIVE_FILL = _fill("CCFFCC")
+NEGATIVE_FILL = _fill("FFCCCC")
+GROUP_BORDER = Border(right=Side(style="thin"))
+
+
+def excel_value(value):
+    """Convert a DataFrame value to what openpyxl should write, NaN becomes an empty cell."""
+    if isinstance(value, (float, np.floating)) and np.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def excel_column_widths(df, padding=2):
+    """Width per column: longest non-empty value or header plus padding, computed on whole arrays."""
+    columns = np.array([str(column) if column else "" for column in df.columns], dtype=str)
+    widths = np.char.str_len(columns) if len(columns) else np.zeros(0, dtype=int)
+    if len(df):
+        values = df.to_numpy(dtype=object)
+        # empty cells, zeros and empty strings don't count, like falsy cell values
+        filled = pd.notna(values) & (values != 0) & (values != "")
+        lengths = np.char.str_len(values.astype(str))
+        widths = np.maximum(widths, np.where(filled, lengths, 0).max(axis=0))
+    return (widths + padding).tolist()
+
+
+INVALID_SHEET_CHARS = re.compile(r"[\[\]:*?/\\]")
+
+
+def excel_sheet_names(names, max_length=31):
+    """
+    Turn names into valid, unique Excel sheet names: forbidden characters are replaced,
+    names are cut to 31 characters and duplicates (case-insensitive) get a " (2)" suffix.
+    """
+    seen = set()
+    sheet_names = []
+    for name in names:
+        base = INVALID_SHEET_CHARS.sub("_", str(name)).strip("'")[:max_length] or "Tabelle"
+        sheet_name = base
+        counter = 2
+        while sheet_name.lower() in seen:
+            suffix = f" ({counter})"
+            sheet_name = base[: max_length - len(suffix)] + suffix
+            counter += 1
+        seen.add(sheet_name.lower())
+        sheet_names.append(sheet_name)
+    return sheet_names
+
+
+def write_styled_sheet(wb, sheet_name, df, style=None):
+    """
+    Append a DataFrame as a styled sheet to a write-only workbook, in one pass.
+
+    The style dict supports:
+        title: text written in bold above the table, followed by an empty row
+        freeze_header: freeze the rows above the table body (default True)
+        highlight_column: column whose positive values are filled red
+        highlight_cell: {'row': <first column value>, 'column': <header>},
+            filled red if negative, green if positive
+        alternating_columns: {'step': 3, 'start_row': 2, 'colors': ('FFFFCC', 'FFFFFF')},
+            fills groups of columns alternately, start_row is counted from the header
+        landscape: A4 landscape page setup
+    """
+    style = style or {}
+    ws = wb.create_sheet(title=sheet_name[:31])  # max Excel sheet name length is 31
+    columns = [str(column) for column in df.columns]
+    header_row = 3 if style.get("title") else 1
+
+    if style.get("freeze_header", True):
+        ws.freeze_panes = f"A{header_row + 1}"
+    for col_idx, width in enumerate(excel_column_widths(df), start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    if style.get("landscape"):
+        ws.page_setup.orientation = Worksheet.ORIENTATION_LANDSCAPE
+        ws.page_setup.paperSize = Worksheet.PAPERSIZE_A4
+        ws.page_setup.fitToWidth = 1
+
+    # style arrays are built once per sheet and shared by all cells that use them,
+    # assigning style objects per cell would hash them again for every cell
+    def style_array(**attributes):
+        template = WriteOnlyCell(ws)
+        for name, value in attributes.items():
+            setattr(template, name, value)
+        return template._style
+
+    def styled_cell(value, style):
+        cell = WriteOnlyCell(ws, value)
+        cell._style = copy(style)
+        return cell
+
+    column_styles = [None] * len(columns)
+    groups = style.get("alternating_columns")
+    if groups:
+        step = groups.get("step", 3)
+        fills = [_fill(color) for color in groups.get("colors", ("FFFFCC", "FFFFFF"))]
+        group_styles = {}
+        for col_idx in range(len(columns)):
+            fill = fills[(col_idx // step) % len(fills)]
+            group_end = col_idx % step == step - 1
+            if (id(fill), group_end) not in group_styles:
+                attributes = {"fill": fill, "border": GROUP_BORDER} if group_end else {"fill": fill}
+                group_styles[id(fill), group_end] = style_array(**attributes)
+            column_styles[col_idx] = group_styles[id(fill), group_end]
+        first_group_row = groups.get("start_row", 2)
+    highlight_col = columns.index(style["highlight_column"]) if style.get("highlight_column") else None
+    highlight_cell = style.get("highlight_cell")
+    highlight_cell_col = None
+    if highlight_cell and highlight_cell.get("column") in columns:
+        highlight_cell_col = columns.index(highlight_cell["column"])
+    highlight_cell_done = False
+    if highlight_col is not None or highlight_cell_col is not None:
+        negative_style = style_array(fill=NEGATIVE_FILL)
+        positive_style = style_array(fill=POSITIVE_FILL)
+
+    if style.get("title"):
+        ws.append([styled_cell(style["title"], style_array(font=TITLE_FONT))])
+        ws.append([])
+
+    header_style = style_array(font=HEADER_FONT, fill=HEADER_FILL, alignment=HEADER_ALIGNMENT, border=HEADER_BORDER)
+    ws.append([styled_cell(column, header_style) for column in df.columns])
+
+    for row_number, row in enumerate(df.itertuples(index=False, name=None), start=2):
+        row_styles = column_styles if groups and row_number >= first_group_row else [None] * len(columns)
+        first_value = excel_value(row[0]) if row else None
+        is_highlight_row = (
+            highlight_cell_col is not None and not highlight_cell_done and first_value == highlight_cell.get("row")
+        )
+        cells = []
+        for col_idx, value in enumerate(row):
+            value = excel_value(value)
+            cell_style = row_styles[col_idx]
+            if col_idx == highlight_col or (is_highlight_row and col_idx == highlight_cell_col):
+                is_number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if col_idx == highlight_col and is_number and value > 0:
+                    cell_style = negative_style
+                if is_highlight_row and col_idx == highlight_cell_col and is_number and value != 0:
+                    cell_style = negative_style if value < 0 else positive_style
+            cells.append(value if cell_style is None else styled_cell(value, cell_style))
+        if is_highlight_row:
+            highlight_cell_done = True
+        ws.append(cells)
+    return ws
+
+
+def write_excel(sheets):
+    """
+    Write [(sheet_name, df, style), ...] into a new workbook and return it as BytesIO.
+    See write_styled_sheet for the style options.
+    """
+    wb = Workbook(write_only=True)
+    for sheet_name, df, style in sheets:
+        write_styled_sheet(wb, sheet_name, df, style)
+    output = io.BytesIO()
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,152 @@
+import io
+import os
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from jobs import submit_to_pool
+from schedule_cache import ScheduleCache
+from excel import excel_sheet_names, write_excel
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# part of every export job id, bump it when the content of an export changes
+EXPORT_VERSION = 1
+
+# rows of a teacher's load sheet: (Aufgabe, load table column, column with the description)
+TEACHER_LOAD_ROWS = [
+    ("Deputat", "Deputat 24/25", None),
+    ("Anr", "Anr", "Sonderaufgaben"),
+    ("Bonus", "Bonus", None),
+    ("Ags-Std", "Ags-Std", "Ags-AG"),
+    ("Poolstd-Std", "Poolstd-Std", "Poolstd-Bg"),
+    ("Deputat (net)", "expected", None),
+    ("WS", "assigned", None),
+    ("Bonus (Zukunft)", "delta", None),
+]
+TEACHER_LOAD_STYLE = {
+    "highlight_cell": {"row": "Bonus (Zukunft)", "column": "Stunden"},
+    "landscape": True,
+}
+
+DASHBOARD_COLUMNS = {
+    "Lehrer*in": None,  # the index of the load table
+    "Deputat": "Deputat 24/25",
+    "Anr": "Anr",
+    "Bonus": "Bonus",
+    "Ags": "Ags-Std",
+    "Poolstd": "Poolstd-Std",
+    "Sonderaufgaben": "Sonderaufgaben",
+    "expected": "expected",
+    "assigned": "assigned",
+    "delta": "delta",
+}
+
+# schedules loaded by export jobs in this (worker) process
+_schedules = ScheduleCache(max_entries=2)
+
+
+class ScheduleChangedError(RuntimeError):
+    pass
+
+
+def schedule_identity(filepath):
+    """What an export job needs to find its schedule again: real path, size and mtime of the file."""
+    return ScheduleCache.file_key(filepath)
+
+
+def load_schedule_for_job(identity):
+    """Load the schedule of an export job, failing if the file was replaced since the job was queued."""
+    path = identity[0]
+    if not os.path.exists(path) or ScheduleCache.file_key(path) != tuple(identity):
+        raise ScheduleChangedError(f"{path} changed since the export was requested")
+    return _schedules.get(path)
+
+
+def teacher_load_tables(load_table):
+    """
+    Build the load sheet of every teacher from the load table in one step.
+    Returns a list of (teacher, DataFrame with Aufgabe/Stunden/Beschreibung).
+    """
+    labels = np.array([label for label, _, _ in TEACHER_LOAD_ROWS], dtype=object)
+    hours = load_table[[column for _, column, _ in TEACHER_LOAD_ROWS]].to_numpy(dtype=object)
+    descriptions = np.full(hours.shape, "", dtype=object)
+    for i, (_, _, description) in enumerate(TEACHER_LOAD_ROWS):
+        if description:
+            descriptions[:, i] = load_table[description].to_numpy(dtype=object)
+
+    return [
+        (name, pd.DataFrame({"Aufgabe": labels, "Stunden": hours[i], "Beschreibung": descriptions[i]}))
+        for i, name in enumerate(load_table.index)
+    ]
+
+
+def teacher_load_workbook(load_table):
+    """Return the bytes of a workbook with one load sheet per teacher, titled with the teacher's name."""
+    tables = teacher_load_tables(load_table)
+    sheet_names = excel_sheet_names(name for name, _ in tables)
+    output = write_excel(
+        (sheet_name, df, dict(TEACHER_LOAD_STYLE, title=name))
+        for sheet_name, (name, df) in zip(sheet_names, tables)
+    )
+    return output.getvalue()
+
+
+def teacher_load_export(identity):
+    return teacher_load_workbook(load_schedule_for_job(identity).get_load_table())
+
+
+def dashboard_workbook(identity):
+    load_table = load_schedule_for_job(identity).get_load_table()
+    df_export = pd.DataFrame({
+        label: load_table.index if column is None else load_table[column].to_numpy()
+        for label, column in DASHBOARD_COLUMNS.items()
+    })
+    return write_excel([("Dashboard", df_export, {"highlight_column": "delta"})]).getvalue()
+
+
+def summary_workbook(identity, sort):
+    tables_by_grade = load_schedule_for_job(identity).build_wide_class_table(sort)
+    output = write_excel(
+        (f"Stufe {table['grade']}", table['df'], {"alternating_columns": {"start_row": 2, "step": 3}})
+        for table in tables_by_grade
+    )
+    return output.getvalue()
+
+
+def schedule_workbook(identity, teacher=None, class_name=None, grade=None):
+    long_df = load_schedule_for_job(identity).get_teacher_schedule_long(
+        teacher=teacher, class_name=class_name, grade=grade
+    )
+    return write_excel([("Sheet1", long_df, None)]).getvalue()
+
+
+def pdf_split_available(processes):
+    """Rendering a PDF in parts only pays off with several processes, merging them needs pypdf."""
+    return processes > 1 and importlib.util.find_spec("pypdf") is not None
+
+
+def render_pdf(html):
+    """Render one HTML document and return the PDF."""
+    # WeasyPrint loads Pango and cairo, only processes that render PDFs import it
+    from weasyprint import HTML
+
+    return HTML(string=html).write_pdf()
+
+
+def render_pdf_documents(documents, processes):
+    """
+    Lay out several HTML documents at the same time in the process pool and
+    return one PDF with their pages in order. Runs in a thread of the web process.
+    """
+    # optional dependency, only needed when documents are rendered in parts
+    from pypdf import PdfWriter
+
+    futures = [submit_to_pool(render_pdf, html, processes=processes) for html in documents]
+    writer = PdfWriter()
+    for future in futures:
+        writer.append(io.BytesIO(future.result()))
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
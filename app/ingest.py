@@ -0,0 +1,33 @@
+from jobs import report_progress
+from schedule import TeacherSchedule, ScheduleFormatError
+from snapshot import write_snapshot
+
+INGEST_STEPS = [
+    "Datei wird gelesen",
+    "Daten werden geprüft",
+    "Übersichten werden berechnet",
+    "Daten werden gespeichert",
+]
+
+
+def ingest_schedule(filepath):
+    """
+    Upload pipeline, run as a background job: parse the workbook, validate it,
+    build the tables the pages and exports need and store them in the snapshot.
+    A workbook that can't be used raises ScheduleFormatError.
+    """
+    report_progress(1, len(INGEST_STEPS), INGEST_STEPS[0])
+    try:
+        ts = TeacherSchedule(filepath)
+    except Exception as e:
+        # the cause stays in the job's traceback, users get the short message
+        raise ScheduleFormatError("Die Datei konnte nicht gelesen werden.") from e
+
+    report_progress(2, len(INGEST_STEPS), INGEST_STEPS[1])
+    ts.validate()
+
+    report_progress(3, len(INGEST_STEPS), INGEST_STEPS[2])
+    ts.precompute()
+
+    report_progress(4, len(INGEST_STEPS), INGEST_STEPS[3])
+    write_snapshot(ts)
@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import atomic_write
+
+JOB_STATES = ("queued", "running", "done", "failed")
+
+_pool = None
+
+# the job run by the current worker process or thread, see report_progress
+_running = threading.local()
+
+
+def process_pool(processes):
+    """Process pool shared by all background work of this process, created on first use."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=processes)
+    return _pool
+
+
+def submit_to_pool(func, *args, processes=1):
+    """Start func in the process pool, a broken pool is replaced once."""
+    global _pool
+    try:
+        return process_pool(processes).submit(func, *args)
+    except BrokenProcessPool:
+        _pool = None
+        return process_pool(processes).submit(func, *args)
+
+
+def _write_json(path, data):
+    with atomic_write(path) as f:
+        json.dump(data, f)
+
+
+def report_progress(step, steps, message):
+    """Record the progress of the running job, a no-op outside of jobs."""
+    job_path = getattr(_running, "job_path", None)
+    if job_path is None:
+        return
+    _running.job.update(progress={"step": step, "steps": steps, "message": message})
+    _write_json(job_path, _running.job)
+
+
+def run_job(folder, job_id, func, args):
+    """
+    Run func(*args) for a job and record its state, in a worker process or thread.
+    The bytes func returns are stored as the job's result, None means no result file.
+    """
+    job_path = os.path.join(folder, f"{job_id}.json")
+    with open(job_path) as f:
+        job = json.load(f)
+    job.update(state="running", started=time.time())
+    _write_json(job_path, job)
+    _running.job, _running.job_path = job, job_path
+
+    result_path = os.path.join(folder, f"{job_id}.result")
+    try:
+        data = func(*args)
+        if data is not None:
+            with atomic_write(result_path, "wb") as f:
+                f.write(data)
+        job.update(state="done", finished=time.time(), result=data is not None)
+    except Exception as e:
+        job.update(
+            state="failed",
+            finished=time.time(),
+            error=traceback.format_exc(),
+            error_type=type(e).__name__,
+            message=str(e),
+        )
+    finally:
+        _running.job = _running.job_path = None
+    _write_json(job_path, job)
+
+
+class JobQueue:
+    """
+    Background jobs, most of them producing a downloadable file.
+
+    Jobs run in the process pool (or in a thread, for jobs that fan out to the
+    pool themselves). The job table is one JSON file per job in folder, next to
+    the result file, so every web worker can answer status and download requests.
+    Job ids are derived from what the job computes, a job that is queued,
+    running or done is not started twice and its result is served again.
+    """
+
+    # a queued or running job older than this is assumed to be lost and started again
+    STALE_AFTER = 600
+
+    def __init__(self, folder, processes=1, retention=None):
+        self.folder = folder
+        self.processes = processes
+        # seconds a finished job is kept, see expired
+        self.retention = retention
+        os.makedirs(folder, exist_ok=True)
+
+    @staticmethod
+    def job_id(*parts):
+        return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+    @staticmethod
+    def is_job_id(job_id):
+        return len(job_id) == 64 and all(c in "0123456789abcdef" for c in job_id)
+
+    def job_path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.json")
+
+    def result_path(self, job_id):
+        return os.path.join(self.folder, f"{job_id}.result")
+
+    def get(self, job_id):
+        """Return the job dict, with its state corrected for lost jobs, or None."""
+        if not self.is_job_id(job_id):
+            return None
+        try:
+            with open(self.job_path(job_id)) as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if job["state"] in ("queued", "running"):
+            if time.time() - job.get("started", job["created"]) > self.STALE_AFTER:
+                job.update(state="failed", error="Der Auftrag wurde nicht beendet.")
+        elif job["state"] == "done" and job.get("result", True) and not os.path.exists(self.result_path(job_id)):
+            job.update(state="failed", error="Das Ergebnis ist nicht mehr vorhanden.")
+        return job
+
+    def needs_run(self, job_id):
+        """True if the job has never run, was lost or failed."""
+        job = self.get(job_id)
+        return job is None or job["state"] == "failed"
+
+    def submit(self, job_id, func, *args, in_thread=False, inline=False, **meta):
+        """
+        Queue func(*args) as job_id unless that job is already queued, running or done.
+        func returns the bytes of the result file or None and, unless in_thread, must be
+        picklable. inline runs the job right away in the calling thread (e.g. to profile it).
+        meta is stored with the job (download_name, mimetype, as_attachment, ...).
+        """
+        if not self.needs_run(job_id):
+            return job_id
+
+        _write_json(self.job_path(job_id), dict(meta, id=job_id, state="queued", created=time.time()))
+        if inline:
+            run_job(self.folder, job_id, func, args)
+        elif in_thread:
+            threading.Thread(target=run_job, args=(self.folder, job_id, func, args), daemon=True).start()
+        else:
+            submit_to_pool(run_job, self.folder, job_id, func, args, processes=self.processes)
+        return job_id
+
+    def expired(self, job):
+        """True if the job finished more than retention seconds ago."""
+        if self.retention is None or job["state"] not in ("done", "failed"):
+            return False
+        return time.time() - job.get("finished", job["created"]) > self.retention
+
+    def remove(self, predicate):
+        """Remove the finished jobs for which predicate(job) is true, with their results."""
+        for entry in os.scandir(self.folder):
+            job_id = entry.name[: -len(".json")]
+            if not entry.name.endswith(".json") or not self.is_job_id(job_id):
+                continue
+            job = self.get(job_id)
+            if job is None or job["state"] in ("queued", "running") or not predicate(job):
+                continue
+            for path in (self.job_path(job_id), self.result_path(job_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def wait(self, job_id, timeout, interval=0.05):
+        """Wait up to timeout seconds for the job to finish and return it."""
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job is not None and job["state"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(interval)
+            job = self.get(job_id)
+        return job
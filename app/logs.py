@@ -0,0 +1,70 @@
+import uuid
+import random
+import logging
+
+from flask import g, request, has_request_context
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+# share of dump_frame calls that log their DataFrame, set by configure_logging
+_frame_sample_rate = 0.0
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the id of the current request to every record, "-" outside of requests."""
+
+    def filter(self, record):
+        record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+        return True
+
+
+def parse_levels(value):
+    """Parse per-module levels like "schedule=DEBUG,snapshot=WARNING"."""
+    levels = {}
+    for item in (value or "").split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def dump_frame(logger, label, df):
+    """
+    Log a whole DataFrame at debug level for a sample of the calls (LOG_FRAME_SAMPLE_RATE).
+    The frame is only formatted when the record is actually emitted.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and _frame_sample_rate and random.random() < _frame_sample_rate:
+        logger.debug("%s (%d rows x %d columns):\n%s", label, df.shape[0], df.shape[1], df)
+
+
+def _assign_request_id():
+    # keep an id set by the proxy, so log lines can be matched across services
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:16]
+
+
+def _return_request_id(response):
+    response.headers["X-Request-ID"] = g.get("request_id", "")
+    return response
+
+
+def configure_logging(app):
+    """
+    Log to stderr with the request id in every line, LOG_LEVEL for everything
+    and LOG_LEVELS to override single modules (by logger name, e.g. "schedule").
+    """
+    global _frame_sample_rate
+    _frame_sample_rate = app.config["LOG_FRAME_SAMPLE_RATE"]
+
+    root = logging.getLogger()
+    if not any(getattr(handler, "request_id_handler", False) for handler in root.handlers):
+        handler = logging.StreamHandler()
+        handler.request_id_handler = True
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(RequestIdFilter())
+        root.addHandler(handler)
+    root.setLevel(app.config["LOG_LEVEL"].upper())
+    for name, level in parse_levels(app.config["LOG_LEVELS"]).items():
+        logging.getLogger(name).setLevel(level)
+
+    app.before_request(_assign_request_id)
+    app.after_request(_return_request_id)
@@ -0,0 +1,621 @@
+import os
+import hmac
+import logging
+
+from flask import Response, send_file, request, redirect, url_for, flash, session, current_app, g
+from flask import render_template, make_response, jsonify
+from werkzeug.utils import secure_filename
+from pymongo.errors import PyMongoError
+
+from jobs import JobQueue
+from metrics import phase, count_cache, render_metrics
+from utils import allowed_file, login_required, admin_required, stream_csv, dataframe_rows
+from profiling import profiles_folder, list_profiles, load_profile, is_profile_id
+from uploads import is_digest, extension_of
+from cleaning import CLEANING_VERSION
+from schedule_store import has_schedule, write_schedule, delete_schedule, find_class, find_teacher, dashboard_rows
+from . import main_bp
+
+logger = logging.getLogger(__name__)
+
+# the export backends (pandas, openpyxl, WeasyPrint) are imported by the views
+# that use them, workers start without them
+
+ALLOWED_EXTENSIONS = {"xls", "xlsx"}
+
+
+@main_bp.app_context_processor
+def inject_breadcrumb():
+    return dict(uploaded_filename=session.get('uploaded_filename'))
+
+
+def stored_schedule():
+    """
+    Id of the session's schedule in Mongo, None if the session has none. A stored
+    schedule is served without its workbook, which may be on another container's
+    disk. One that is not stored yet (e.g. uploaded before it was stored there) is
+    written from the local workbook, None if that is not here either.
+    """
+    schedule_id = session.get('uploaded_sha256')
+    if not is_digest(schedule_id):
+        return None
+    db = current_app.mongo.db
+    if not has_schedule(db, schedule_id):
+        filepath = uploaded_path()
+        if not filepath:
+            return None
+        ts = current_app.schedule_cache.get(filepath)
+        with phase("load"):
+            write_schedule(db, schedule_id, ts)
+    return schedule_id
+
+
+def uploaded_path():
+    """Path of the workbook the session works with, None if there is none (any more)."""
+    digest = session.get('uploaded_sha256')
+    if not is_digest(digest):
+        return None
+    filepath = current_app.uploads.path(digest, session.get('uploaded_extension', "xlsx"))
+    return filepath if os.path.exists(filepath) else None
+
+
+@main_bp.route('/')
+def index():
+    if 'username' in session:
+        return render_template("index.html")
+    return redirect(url_for('accounts.login'))
+
+@main_bp.route("/start")
+@login_required
+def start():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("Keine Datei hochgeladen", "warning")
+        return redirect(url_for('main.upload_file'))
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        class_names = ts.get_classes()
+        teacher_names = ts.get_df().index.tolist()
+    return render_template("start.html", classes=class_names, teachers=teacher_names)
+
+
+@main_bp.route("/upload", methods=["GET", "POST"])
+@login_required
+def upload_file():
+    if request.method == "POST":
+        file = request.files.get("file")
+        if file and allowed_file(file.filename, ALLOWED_EXTENSIONS):
+            filename = secure_filename(file.filename)
+            extension = extension_of(file.filename)
+            # stored by content, an identical workbook is kept once for all users
+            digest = current_app.uploads.save(file.stream, session['username'], filename, extension)
+            filepath = current_app.uploads.path(digest, extension)
+
+            # parse, validate, precompute and snapshot the workbook in the background,
+            # a workbook that was ingested before is ready right away
+            from ingest import ingest_schedule
+
+            job_id = JobQueue.job_id("ingest", CLEANING_VERSION, digest, extension)
+            session['pending_upload'] = {"job_id": job_id, "sha256": digest, "extension": extension, "filename": filename}
+            current_app.ingest_jobs.submit(
+                job_id, ingest_schedule, filepath, download_name=filename, schedule=digest
+            )
+            current_app.ingest_jobs.wait(job_id, current_app.config["INGEST_JOB_WAIT"])
+            return redirect(url_for("main.upload_status", job_id=job_id))
+        else:
+            flash("Invalid file type. Please upload an Excel file.", "danger")
+            return redirect(url_for("main.upload_file"))
+
+    return render_template("upload.html")
+
+
+@main_bp.route("/upload/<job_id>")
+@login_required
+def upload_status(job_id):
+    """Progress of the upload pipeline, the dashboard once the schedule is ready."""
+    pending = session.get('pending_upload')
+    if not pending or pending["job_id"] != job_id:
+        return redirect(url_for("main.upload_file"))
+
+    job = current_app.ingest_jobs.get(job_id)
+    if job is None or job["state"] in ("done", "failed"):
+        target = finish_upload(job)
+        if request.headers.get("HX-Request"):
+            response = make_response("")
+            response.headers["HX-Redirect"] = target
+            return response
+        return redirect(target)
+
+    template = "partials/_upload_progress.html" if request.headers.get("HX-Request") else "upload_progress.html"
+    return render_template(template, job=job)
+
+
+def finish_upload(job):
+    """Make a processed upload the session's schedule and return where to go next."""
+    pending = session.pop('pending_upload')
+    if job is None or job["state"] == "failed":
+        job = job or {}
+        logger.error("Upload %s of %s failed:\n%s", pending['sha256'], pending['filename'], job.get('error'))
+        current_app.uploads.release(session['username'], pending['sha256'], pending['extension'])
+        collect_uploads()
+        if job.get("error_type") == "ScheduleFormatError":
+            flash(job["message"], "danger")
+        else:
+            flash("Die Datei konnte nicht gelesen werden.", "danger")
+        return url_for("main.upload_file")
+
+    session['uploaded_filename'] = pending["filename"]
+    session['uploaded_sha256'] = pending["sha256"]
+    session['uploaded_extension'] = pending["extension"]
+    # load the snapshot and store the schedule in Mongo now, the first pages are served from there
+    stored_schedule()
+    flash("Upload successful!", "success")
+    collect_uploads()
+    return url_for("main.dashboard")
+
+
+@main_bp.route("/class/<cls>")
+@login_required
+def show_class(cls):
+    schedule_id = stored_schedule()
+    if not schedule_id:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    with phase("load"):
+        records, main_teacher, deputies = find_class(current_app.mongo.db, schedule_id, cls)
+    return render_template(
+        "class.html", 
+        class_name=cls, 
+        table=records,
+        main_teacher=main_teacher,
+        deputies=deputies,
+    )
+
+
+@main_bp.route("/teacher/<name>")
+@login_required
+def show_teacher(name):
+    schedule_id = stored_schedule()
+    if not schedule_id:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    with phase("load"):
+        records, load, compare = find_teacher(current_app.mongo.db, schedule_id, name)
+    total = compare["assigned"]
+    return render_template(
+        "teacher.html",
+        teacher_name=name,
+        table=records,
+        total=total,
+        load=load,
+        compare=compare,
+    )
+
+
+@main_bp.route("/teacher/<name>/load")
+@login_required
+def show_teacher_load(name):
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        data = ts.compare_load(name)
+        # Optional: enrich with anr and bonus separately
+        meta = ts.get_teaching_load(name)
+    data["dep"] = meta.get("Deputat 24/25", 0)
+    data["anr"] = meta.get("Anr", 0)
+    data["bonus"] = meta.get("Bonus", 0)
+    data["sonderaufgaben"] = meta.get("Sonderaufgaben", '')
+    data["agsstd"] = meta.get("Ags-Std", 0)
+    data['ags'] = meta.get("Ags-AG", '')
+    data["poolstd"] = meta.get("Poolstd-Std", 0)
+    data['pool'] = meta.get("Poolstd-Bg", '')
+
+    return render_template("teacher_load.html", data=data)
+
+
+@main_bp.route("/teacher/load/export/excel")
+@login_required
+def export_teacher_load_excel():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    from exports import XLSX_MIMETYPE, schedule_identity, teacher_load_export
+
+    return run_export_job(
+        export_job_id("teacher-load"),
+        teacher_load_export, schedule_identity(filepath),
+        download_name="teachers_loads.xlsx", mimetype=XLSX_MIMETYPE,
+    )
+
+
+@main_bp.route("/dashboard")
+@login_required
+def dashboard():
+    schedule_id = stored_schedule()
+    if not schedule_id:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    with phase("load"):
+        rows = dashboard_rows(current_app.mongo.db, schedule_id)
+    return render_template("dashboard.html", rows=rows)
+
+
+@main_bp.route("/export/dashboard/csv")
+@login_required
+def export_dashboard_csv():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        rows = ts.get_dashboard_rows()
+    if not rows:
+        return "No data to export", 400
+
+    column_order = ["teacher", "dep", "anr", "bonus", "expected", "assigned", "delta"]
+    column_labels = [
+        "Lehrer*in",
+        "Deputat",
+        "Anr",
+        "Bonus",
+        "Ags-Std",
+        "Poolstd-Std",
+        "Deputat (net)",
+        "WS",
+        "Delta",
+    ]
+    def generate_rows():
+        yield column_labels
+        for row in rows:
+            yield [
+                row.get("teacher", ""),
+                row.get("dep", ""),
+                row.get("anr", ""),
+                row.get("bonus", ""),
+                row.get("ags", ""),
+                row.get("pool", ""),
+                row.get("expected", ""),
+                row.get("assigned", ""),
+                row.get("delta", ""),
+            ]
+
+    return stream_csv(generate_rows(), "teacher_dashboard.csv")
+
+@main_bp.route("/export/dashboard/excel")
+@login_required
+def export_dashboard_excel():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    from exports import XLSX_MIMETYPE, schedule_identity, dashboard_workbook
+
+    return run_export_job(
+        export_job_id("dashboard"),
+        dashboard_workbook, schedule_identity(filepath),
+        download_name="dashboard.xlsx", mimetype=XLSX_MIMETYPE,
+    )
+
+
+@main_bp.route("/export/class/<cls>.csv")
+@login_required
+def export_class_csv(cls):
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        subset = ts.get_teachers_in_class(cls)
+    if not subset:
+        return "No data", 404
+
+    import pandas as pd
+
+    export_df = pd.DataFrame(subset)
+    return stream_csv(dataframe_rows(export_df), f"{cls}.csv")
+
+
+@main_bp.route("/export/teacher/<name>.csv")
+@login_required
+def export_teacher_csv(name):
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        subset = ts.get_classes_of_teacher(name)
+    if not subset:
+        return "No data", 404
+
+    import pandas as pd
+
+    export_df = pd.DataFrame(subset)
+    return stream_csv(dataframe_rows(export_df), f"{name}.csv")
+
+
+@main_bp.route("/summary")
+@login_required
+def class_summary():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    sort = request.args.get("sort", "teacher")
+    with phase("compute"):
+        df_list = ts.build_wide_class_table(sort)
+    if request.headers.get("HX-Request"):
+        return render_template("partials/_class_summary_table.html", table_list=df_list, sort=sort)
+    return render_template("class_summary.html", table_list=df_list, sort=sort)
+
+
+@main_bp.route("/summary/export/", defaults={'sort': 'teacher'})
+@main_bp.route("/summary/export/<sort>")
+@login_required
+def export_summary_csv(sort):
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        tables_by_grade = ts.build_wide_class_table(sort)
+
+    def generate_rows():
+        # one block per grade, like the sheets of the Excel export
+        for table in tables_by_grade:
+            yield [f"Stufe {table['grade']}"]
+            yield from dataframe_rows(table['df'])
+            yield []
+
+    return stream_csv(generate_rows(), "teacher_class_summary.csv")
+
+@main_bp.route("/summary/export/excel/")
+@login_required
+def export_summary_excel():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    sort = request.args.get("sort", "teacher")
+    from exports import XLSX_MIMETYPE, schedule_identity, summary_workbook
+
+    return run_export_job(
+        export_job_id("summary", sort),
+        summary_workbook, schedule_identity(filepath), sort,
+        download_name="class_tables.xlsx", mimetype=XLSX_MIMETYPE,
+    )
+
+
+@main_bp.route("/summary/export/pdf")
+@login_required
+def export_summary_pdf():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    from exports import render_pdf, render_pdf_documents, pdf_split_available
+
+    sort = request.args.get("sort", "teacher")
+    # the file name is printed on every page, so it is part of the id
+    job_id = export_job_id("summary-pdf", sort, session.get('uploaded_filename'))
+    needs_run = current_app.export_jobs.needs_run(job_id)
+    count_cache("export_jobs", not needs_run)
+    if needs_run:
+        # the HTML needs templates and session, only the layout runs in the background
+        ts = current_app.schedule_cache.get(filepath)
+        with phase("compute"):
+            grade_tables = ts.build_wide_class_table(sort)  # list of {'grade': '5', 'df': DataFrame}
+        processes = current_app.export_jobs.processes
+        split_pdf = current_app.config["PDF_SPLIT_GRADES"] and pdf_split_available(processes)
+        if split_pdf and len(grade_tables) > 1 and not g.get("profiling"):
+            # one document per grade, laid out in parallel and merged into one PDF
+            documents = [render_template("pdf_export.html", grade_tables=[block]) for block in grade_tables]
+            func, args, in_thread = render_pdf_documents, (documents, processes), True
+        else:
+            html = render_template("pdf_export.html", grade_tables=grade_tables)
+            func, args, in_thread = render_pdf, (html,), False
+        current_app.export_jobs.submit(
+            job_id, func, *args, in_thread=in_thread, inline=g.get("profiling", False), source_url=request.full_path,
+            schedule=session['uploaded_sha256'], download_name="alle_klassenstufen.pdf", mimetype="application/pdf", as_attachment=False,
+        )
+    with phase("encode"):
+        current_app.export_jobs.wait(job_id, current_app.config["EXPORT_JOB_WAIT"])
+    return job_response(job_id)
+
+
+@main_bp.route("/export/schedule.csv")
+@login_required
+def export_schedule_csv():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    ts = current_app.schedule_cache.get(filepath)
+    with phase("compute"):
+        long_df = ts.get_teacher_schedule_long(
+            teacher=request.args.get("teacher"),
+            class_name=request.args.get("class"),
+            grade=request.args.get("grade"),
+        )
+
+    return stream_csv(dataframe_rows(long_df), "teacher_schedule.csv")
+
+@main_bp.route("/export/schedule.xlsx")
+@login_required
+def export_schedule_xlsx():
+    filepath = uploaded_path()
+    if not filepath:
+        flash("No file uploaded yet.", "warning")
+        return redirect(url_for('main.upload_file'))
+
+    from exports import XLSX_MIMETYPE, schedule_identity, schedule_workbook
+
+    params = (request.args.get("teacher"), request.args.get("class"), request.args.get("grade"))
+    return run_export_job(
+        export_job_id("schedule", *params),
+        schedule_workbook, schedule_identity(filepath), *params,
+        download_name="teacher_schedule.xlsx", mimetype=XLSX_MIMETYPE,
+    )
+
+
+#############################
+# export jobs
+#############################
+
+# CSV exports are streamed directly, everything that builds a workbook or a PDF runs as a job
+
+def collect_uploads():
+    """Remove the uploads no user refers to any more, with their snapshots, jobs and Mongo documents."""
+    try:
+        removed = current_app.uploads.collect_garbage(current_app.export_jobs)
+        for schedule_id in removed:
+            delete_schedule(current_app.mongo.db, schedule_id)
+    except (OSError, PyMongoError):
+        logger.exception("Removing unreferenced uploads failed")
+
+
+def export_job_id(*params):
+    """
+    Same schedule content and parameters give the same job, so its result is reused,
+    until the exports or the cleaning logic change.
+    """
+    from exports import EXPORT_VERSION
+
+    return JobQueue.job_id(EXPORT_VERSION, CLEANING_VERSION, session['uploaded_sha256'], *params)
+
+
+def run_export_job(job_id, func, *args, **job):
+    """Queue an export job and wait briefly, quick exports are served in the same request."""
+    count_cache("export_jobs", not current_app.export_jobs.needs_run(job_id))
+    current_app.export_jobs.submit(
+        job_id, func, *args, inline=g.get("profiling", False), source_url=request.full_path,
+        schedule=session['uploaded_sha256'], **job
+    )
+    with phase("encode"):
+        current_app.export_jobs.wait(job_id, current_app.config["EXPORT_JOB_WAIT"])
+    return job_response(job_id)
+
+
+def job_response(job_id):
+    """Serve a finished job, otherwise the progress view that htmx keeps polling."""
+    job = current_app.export_jobs.get(job_id)
+    if job is None:
+        return "Not found", 404
+
+    if job["state"] == "done":
+        if request.headers.get("HX-Request"):
+            response = make_response("")
+            response.headers["HX-Redirect"] = url_for("main.download_job", job_id=job_id)
+            return response
+        return download_job(job_id)
+
+    if job["state"] == "failed":
+        logger.error("Export job %s failed:\n%s", job_id, job.get('error'))
+    template = "partials/_job.html" if request.headers.get("HX-Request") else "job.html"
+    return render_template(template, job=job)
+
+
+@main_bp.route("/jobs/<job_id>")
+@login_required
+def job_status(job_id):
+    job = current_app.export_jobs.get(job_id)
+    if job is None:
+        return "Not found", 404
+    if request.accept_mimetypes.best == "application/json":
+        return jsonify(
+            id=job_id,
+            state=job["state"],
+            download_url=url_for("main.download_job", job_id=job_id) if job["state"] == "done" else None,
+        )
+    return job_response(job_id)
+
+
+@main_bp.route("/jobs/<job_id>/download")
+@login_required
+def download_job(job_id):
+    job = current_app.export_jobs.get(job_id)
+    if job is None or job["state"] != "done" or not job.get("result", True):
+        return "Not found", 404
+    return send_file(
+        current_app.export_jobs.result_path(job_id),
+        mimetype=job["mimetype"],
+        as_attachment=job.get("as_attachment", True),
+        download_name=job["download_name"],
+    )
+
+
+#############################
+# profiles
+#############################
+
+# an admin adds ?profile=1 (or an X-Profile: 1 header) to a page, see profiling.py
+
+@main_bp.route("/profiles")
+@login_required
+@admin_required
+def profiles():
+    return render_template("profiles.html", profiles=list_profiles(profiles_folder()))
+
+
+@main_bp.route("/profiles/<profile_id>")
+@login_required
+@admin_required
+def show_profile(profile_id):
+    profile = load_profile(profiles_folder(), profile_id)
+    if profile is None:
+        return "Not found", 404
+    return render_template("profile.html", profile=profile)
+
+
+@main_bp.route("/profiles/<profile_id>.prof")
+@login_required
+@admin_required
+def download_profile(profile_id):
+    if not is_profile_id(profile_id):
+        return "Not found", 404
+    path = os.path.join(profiles_folder(), f"{profile_id}.prof")
+    if not os.path.exists(path):
+        return "Not found", 404
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True)
+
+
+#############################
+# metrics
+#############################
+
+def metrics_allowed():
+    """Scrapers send the METRICS_TOKEN as bearer token, admins may look at the metrics in the browser."""
+    token = current_app.config["METRICS_TOKEN"]
+    if token and hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    return session.get('role') == "admin"
+
+
+@main_bp.route("/metrics")
+def metrics():
+    if not metrics_allowed():
+        return "Forbidden", 403
+    # each gunicorn worker reports its own requests
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
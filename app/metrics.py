@@ -0,0 +1,180 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+from flask import g, request, has_request_context, before_render_template, template_rendered
+
+# latency buckets in seconds, from a cache hit to a full parse of a large workbook
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+PHASES = ("load", "compute", "render", "encode")
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (+Inf last), sum]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        position = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[position] += 1
+            counts[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, [("le", _format_number(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_number(counts[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "teacherapp_request_seconds", "Time to handle a request.", ["route", "method", "status"]
+)
+PHASE_SECONDS = Histogram(
+    "teacherapp_request_phase_seconds",
+    "Time spent per phase of a request: load (schedule cache or parse), compute, render, encode.",
+    ["route", "phase"],
+)
+CACHE_REQUESTS = Counter(
+    "teacherapp_cache_requests_total", "Lookups in the schedule, snapshot and export job caches.", ["cache", "result"]
+)
+
+REGISTRY = [REQUEST_SECONDS, PHASE_SECONDS, CACHE_REQUESTS]
+
+
+def render_metrics():
+    """All metrics of this process in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def count_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def current_route():
+    return request.endpoint or "unknown"
+
+
+@contextmanager
+def phase(name):
+    """Add the time of the block to the given phase of the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "metrics_phases" in g:
+            g.metrics_phases[name] = g.metrics_phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def timed_iter(iterable, route, phase_name="encode"):
+    """
+    Iterate a streamed response body and record the time spent producing it.
+    Streaming continues after the request ended, so the phase is recorded on its own.
+    """
+    elapsed = 0.0
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            break
+        finally:
+            elapsed += time.perf_counter() - start
+        yield chunk
+    PHASE_SECONDS.observe(elapsed, route=route, phase=phase_name)
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_phases = {}
+
+
+def _finish_request(response):
+    if "metrics_start" in g:
+        route = current_route()
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - g.metrics_start, route=route, method=request.method, status=response.status_code
+        )
+        for name, seconds in g.metrics_phases.items():
+            PHASE_SECONDS.observe(seconds, route=route, phase=name)
+    return response
+
+
+def _start_render(sender, template, context, **extra):
+    if has_request_context():
+        g.metrics_render_start = time.perf_counter()
+
+
+def _finish_render(sender, template, context, **extra):
+    if has_request_context() and "metrics_render_start" in g and "metrics_phases" in g:
+        elapsed = time.perf_counter() - g.pop("metrics_render_start")
+        g.metrics_phases["render"] = g.metrics_phases.get("render", 0.0) + elapsed
+
+
+def init_metrics(app):
+    """Time every request of app, rendering is measured through Flask's template signals."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_start_render, app)
+    template_rendered.connect(_finish_render, app)
@@ -0,0 +1,194 @@
+import os
+import io
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import sysconfig
+
+from flask import g, request, session, current_app, make_response
+
+# time of a profile is attributed to the first of these whose path part is in the file name
+LIBRARIES = [
+    ("pandas", ("/pandas/",)),
+    ("numpy", ("/numpy/",)),
+    ("openpyxl", ("/openpyxl/", "/et_xmlfile/")),
+    ("Jinja", ("/jinja2/", "/markupsafe/")),
+    ("WeasyPrint", ("/weasyprint/", "/pydyf/", "/tinycss2/", "/cssselect2/", "/fontTools/", "/html5lib/")),
+    ("Flask/Werkzeug", ("/flask/", "/werkzeug/")),
+    ("PyMongo", ("/pymongo/", "/bson/")),
+]
+
+# a call tree node is shown if it takes at least this share of the request
+TREE_MIN_SHARE = 0.01
+TREE_MAX_DEPTH = 15
+
+STDLIB_FOLDER = sysconfig.get_paths()["stdlib"]
+
+
+def profiling_requested():
+    """?profile=1 or an X-Profile: 1 header, honoured for admins only."""
+    if g.get("profiling"):
+        # a view that calls another login_required view is already being profiled
+        return False
+    if request.args.get("profile") != "1" and request.headers.get("X-Profile") != "1":
+        return False
+    return session.get("role") == "admin"
+
+
+def profiles_folder():
+    return os.path.join(current_app.config["UPLOAD_FOLDER"], "profiles")
+
+
+def is_profile_id(profile_id):
+    return len(profile_id) == 32 and all(c in "0123456789abcdef" for c in profile_id)
+
+
+def _library(filename, app_folder):
+    if filename == "~":
+        return "Python builtins"
+    for name, parts in LIBRARIES:
+        if any(part in filename for part in parts):
+            return name
+    if filename.startswith(app_folder):
+        return "App"
+    if filename.startswith(STDLIB_FOLDER) and "-packages" not in filename:
+        return "Python stdlib"
+    return "Other"
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def _call_tree(stats, root, total):
+    """Indented lines of the calls below root that take at least TREE_MIN_SHARE of total."""
+    callees = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, cumulative) in callers.items():
+            callees.setdefault(caller, []).append((cumulative, func))
+
+    lines = []
+
+    def visit(func, cumulative, depth, path):
+        lines.append(f"{'  ' * depth}{cumulative * 1000:9.1f} ms  {_label(func)}")
+        if depth >= TREE_MAX_DEPTH:
+            return
+        for child_time, child in sorted(callees.get(func, []), reverse=True):
+            if child_time >= total * TREE_MIN_SHARE and child not in path:
+                visit(child, child_time, depth + 1, path | {child})
+
+    visit(root, stats.stats[root][3], 0, {root})
+    return lines
+
+
+def summarize(profiler, view_func, app_folder):
+    """Top functions, time per library and call tree of a finished profile."""
+    stats = pstats.Stats(profiler)
+    code = view_func.__code__
+    root = (code.co_filename, code.co_firstlineno, code.co_name)
+    # includes the streamed body, which is produced after the view returned
+    total = stats.total_tt
+
+    libraries = {}
+    for func, (_, _, own, _, _) in stats.stats.items():
+        library = _library(func[0], app_folder)
+        libraries[library] = libraries.get(library, 0.0) + own
+
+    def top(sort_key, limit=30):
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(sort_key).print_stats(limit)
+        # skip the header pstats writes before the table
+        text = output.getvalue()
+        return text[text.find("   ncalls"):] if "   ncalls" in text else text
+
+    return {
+        "total": total,
+        "libraries": sorted(libraries.items(), key=lambda item: item[1], reverse=True),
+        "top_cumulative": top("cumulative"),
+        "top_own": top("tottime"),
+        "call_tree": _call_tree(stats, root, total) if root in stats.stats else [],
+    }
+
+
+def prune_profiles(folder, keep):
+    """Remove all but the newest keep profiles."""
+    profiles = sorted(
+        (entry for entry in os.scandir(folder) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in profiles[keep:]:
+        profile_id = entry.name[: -len(".json")]
+        for suffix in (".json", ".prof"):
+            path = os.path.join(folder, profile_id + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def profile_request(view_func, args, kwargs):
+    """
+    Run the view under cProfile and store the profile under UPLOAD_FOLDER/profiles.
+    Streamed responses are consumed inside the profile, export jobs run inline.
+    """
+    g.profiling = True
+    profiler = cProfile.Profile()
+    started = time.time()
+    profiler.enable()
+    try:
+        response = make_response(view_func(*args, **kwargs))
+        if response.is_streamed:
+            response.make_sequence()
+    finally:
+        profiler.disable()
+
+    folder = profiles_folder()
+    os.makedirs(folder, exist_ok=True)
+    profile_id = uuid.uuid4().hex
+    profiler.dump_stats(os.path.join(folder, f"{profile_id}.prof"))
+    meta = dict(
+        summarize(profiler, view_func, os.path.dirname(os.path.abspath(__file__))),
+        id=profile_id,
+        path=request.full_path,
+        endpoint=request.endpoint,
+        user=session.get("username"),
+        request_id=g.get("request_id"),
+        started=started,
+        started_at=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(started)),
+        status=response.status_code,
+    )
+    with open(os.path.join(folder, f"{profile_id}.json"), "w") as f:
+        json.dump(meta, f)
+    prune_profiles(folder, current_app.config["PROFILES_KEEP"])
+
+    response.headers["X-Profile-Id"] = profile_id
+    return response
+
+
+def list_profiles(folder):
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(folder):
+        return []
+    profiles = []
+    for entry in os.scandir(folder):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return sorted(profiles, key=lambda profile: profile["started"], reverse=True)
+
+
+def load_profile(folder, profile_id):
+    if not is_profile_id(profile_id):
+        return None
+    try:
+        with open(os.path.join(folder, f"{profile_id}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -1,22 +1,62 @@
 import pandas as pd
 import numpy as np
 import json
+import logging
 from natsort import index_natsorted
 from collections import defaultdict
+from pandas.io.parsers import TextParser
 
 
+from cleaning import CLEANING_VERSION
 from utils import is_valid_teacher, rename_columns, convert_empty_string_to_zero
+from excel import read_sheet_rows
+from logs import dump_frame
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduleFormatError(ValueError):
+    """The workbook can be read but is not a schedule this app understands."""
+    pass
 
 
 class TeacherSchedule:
+    # see cleaning.py
+    CLEANING_VERSION = CLEANING_VERSION
+
+    fach_std_translate = {
+        "Fach": "Fach",
+        "5std LF": "Fach",
+        "3std BF": "Fach",
+        "2std BF": "Fach",
+        "Std": "Std",
+    }
+    grade_columns = ["5", "6", "7", "8", "9", "10", "KS1", "KS2"]
+
+    # teacher meta columns (after rename_columns) and the value used when one is missing
+    load_meta_defaults = {
+        "Deputat 24/25": 0,
+        "Anr": 0,
+        "Bonus": 0,
+        "Sonderaufgaben": "",
+        "Ags-AG": "",
+        "Ags-Std": 0,
+        "Poolstd-Bg": "",
+        "Poolstd-Std": 0,
+    }
+
     def __init__(self, excel_path, data_start_row=3):
         # class teacher and deputy data
         self.excel_path = excel_path
-        self.df = pd.read_excel(excel_path, header=[0, 1])
+        self._load_table = None
+        self._assignments = None
+        self._class_summary = None
+        self._wide_tables = {}
+        self.df, header_rows = self._read_workbook(excel_path)
+        self.header_index = self._build_header_index(header_rows)
         self.df = self.df.iloc[data_start_row:].copy()
         # self.main_teachers_row = pd.read_excel(excel_path, header=None).iloc[2]
         # self.deputy_teachers_row = pd.read_excel(excel_path, header=None).iloc[3]
-        self.raw_df = pd.read_excel(excel_path, header=None)
 
         # print("main teachers row:\n", self.main_teachers_row)
         # self.main_teachers_row = raw_df.iloc[2] 
@@ -24,33 +64,112 @@ class TeacherSchedule:
         # self.df = raw_df.iloc[data_start_row:].copy()
         # self.df = pd.read_excel(excel_path, header=[0, 1], skiprows=data_start_row - 1)
         # self.df = pd.read_excel(excel_path, header=[0, 1], skiprows=data_start_row - 1)
-        self.fach_std_translate = {
-            "Fach": "Fach",
-            "5std LF": "Fach",
-            "3std BF": "Fach",
-            "2std BF": "Fach",
-            "Std": "Std",
-        }
-        print("df:\n", self.df)
+        dump_frame(logger, "raw schedule", self.df)
         self._clean_headers()
         self._normalize_headers()
         self._remove_non_teacher_rows()
         self.teaching_loads = self._extract_teacher_meta()
-        self.class_teachers = self._extract_class_teachers()
+        self.class_teachers = self._extract_class_teachers(header_rows[2:4])
         self._remove_non_class_columns()
         self._standardize_columns()
         self.class_columns = self._extract_class_columns()
         #self.grade_columns = set([col[0] for col in self.class_columns])
-        self.grade_columns = ["5", "6", "7", "8", "9", "10", "KS1", "KS2"]
-        print("class columns:\n", self.class_columns)
+        logger.debug("%d class columns: %s", len(self.class_columns), self.class_columns)
+
+    @classmethod
+    def from_state(cls, excel_path, df, teaching_loads, class_teachers, class_columns, header_index=None,
+                   load_table=None, assignment_edges=None, wide_tables=None):
+        """
+        Rebuild a schedule from already cleaned state (e.g. a snapshot) without reading Excel.
+        Precomputed load table, assignment edges and wide class tables are reused if given.
+        """
+        ts = cls.__new__(cls)
+        ts.excel_path = excel_path
+        ts.df = df
+        ts.header_index = header_index or {}
+        ts.teaching_loads = teaching_loads
+        ts.class_teachers = class_teachers
+        ts.class_columns = class_columns
+        ts._load_table = load_table
+        ts._assignments = None if assignment_edges is None else ts._index_assignments(assignment_edges)
+        ts._class_summary = None
+        ts._wide_tables = dict(wide_tables or {})
+        return ts
+
+    def validate(self):
+        """Raise ScheduleFormatError if the cleaned data is not a usable schedule."""
+        if self.df.empty and len(self.df.columns) == 0:
+            raise ScheduleFormatError("Die Tabelle enthält keine Daten.")
+        if not self.class_columns:
+            raise ScheduleFormatError("Es wurden keine Klassenspalten (Fach/Std) gefunden.")
+        if self.df.empty:
+            raise ScheduleFormatError("Es wurden keine Lehrkräfte (\"Name, Vorname\") gefunden.")
+        if self.df.index.has_duplicates:
+            duplicates = ", ".join(sorted(set(self.df.index[self.df.index.duplicated()])))
+            raise ScheduleFormatError(f"Lehrkräfte kommen mehrfach vor: {duplicates}")
+
+    def precompute(self):
+        """Build everything the pages and exports derive from the schedule, e.g. before storing it."""
+        self.get_load_table()
+        self.get_assignments()
+        for sort in ("teacher", "fach"):
+            self.build_wide_class_table(sort)
+
+    @staticmethod
+    def _read_workbook(excel_path, raw_row_count=4):
+        """
+        Open the workbook once and build everything from the same cell grid:
+        the frame with the two-row header (like pd.read_excel(header=[0, 1]))
+        and the first raw rows (headers, class teachers, deputies), blanks as None.
+        """
+        if not excel_path.lower().endswith((".xlsx", ".xlsm")):
+            # formats openpyxl cannot read are left to pandas and its engines
+            raw_df = pd.read_excel(excel_path, header=None, nrows=raw_row_count)
+            raw_rows = raw_df.astype(object).where(raw_df.notna(), None).values.tolist()
+            return pd.read_excel(excel_path, header=[0, 1]), raw_rows
+
+        rows = read_sheet_rows(excel_path)
+        if not rows:
+            return pd.DataFrame(), []
+        if len(rows) < 2:
+            raise ValueError(f"header index 1 exceeds maximum index {len(rows) - 1} of data.")
+        raw_rows = [[None if value == "" else value for value in row] for row in rows[:raw_row_count]]
+
+        # forward fill the header rows for the MultiIndex (merged class cells)
+        data = [list(row) for row in rows[:2]] + rows[2:]
+        control_row = [True] * len(data[0])
+        for header_row in (0, 1):
+            row = data[header_row]
+            last = row[0]
+            for i in range(1, len(row)):
+                if not control_row[i]:
+                    last = row[i]
+                if row[i] == "" or row[i] is None:
+                    row[i] = last
+                else:
+                    control_row[i] = False
+                    last = row[i]
+
+        df = TextParser(data, header=[0, 1], skip_blank_lines=False).read()
+        return df, raw_rows
+
+    @staticmethod
+    def _build_header_index(raw_rows):
+        """Map the stripped (header, subheader) pair of every Excel column to its position."""
+        header_index = {}
+        if len(raw_rows) < 2:
+            return header_index
+        for i, (lvl0, lvl1) in enumerate(zip(raw_rows[0], raw_rows[1])):
+            key = (str(lvl0).strip() if lvl0 is not None else "", str(lvl1).strip() if lvl1 is not None else "")
+            header_index.setdefault(key, i)  # the first match wins
+        return header_index
 
     def _get_excel_col_index(self, col_tuple):
         """Find the original Excel column index for a given MultiIndex column."""
-        # Look in the first two rows of raw_df for matching headers
-        for i, (lvl0, lvl1) in enumerate(zip(self.raw_df.iloc[0], self.raw_df.iloc[1])):
-            if str(lvl0).strip() == col_tuple[0] and str(lvl1).strip() == col_tuple[1]:
-                return i
-        raise ValueError(f"Column {col_tuple} not found in raw_df headers.")
+        try:
+            return self.header_index[col_tuple]
+        except KeyError:
+            raise ValueError(f"Column {col_tuple} not found in the Excel headers.") from None
 
     def _clean_headers(self):
         # Drop columns where BOTH the main header and subheader are blank or NaN
@@ -161,17 +280,18 @@ class TeacherSchedule:
         return result_df
 
     
-    def _extract_class_teachers(self):
+    def _extract_class_teachers(self, class_teacher_rows):
         class_teachers = {}
         # Columns from the actual data table (e.g., ('5a', 'Fach'), ...)
         class_cols = [col for col in self.df.columns if col[1] == 'Fach']
-        
+        # rows 3 and 4 of the sheet: main teachers and deputies
+        main_row, deputy_row = (list(class_teacher_rows) + [[], []])[:2]
+
         for col in class_cols:
-            col_idx = self._get_excel_col_index(col)  # We'll define this next
+            col_idx = self._get_excel_col_index(col)
 
-            # Fetch main and deputy teachers from row 3 and 4 (raw_df)
-            main_teacher = self.raw_df.iloc[2, col_idx]
-            deputy_teachers = self.raw_df.iloc[3, col_idx]
+            main_teacher = main_row[col_idx] if col_idx < len(main_row) else None
+            deputy_teachers = deputy_row[col_idx] if col_idx < len(deputy_row) else None
 
             class_name = col[0]
             deputies = [
@@ -201,6 +321,41 @@ class TeacherSchedule:
 
         return self.teaching_loads.loc[teacher].to_dict()
 
+    def get_load_table(self):
+        """
+        Return assigned/expected/delta plus all meta columns for every teacher as one
+        DataFrame indexed by teacher. It is computed once with column-wise operations.
+        """
+        if self._load_table is None:
+            stunden = self.df[[col for col in self.df.columns if col[1] == "Std"]]
+            text_cols = stunden.columns[stunden.dtypes == object]
+            if len(text_cols):
+                stunden = stunden.copy()
+                stunden[text_cols] = stunden[text_cols].apply(pd.to_numeric, errors="coerce")
+            assigned = stunden.fillna(0).sum(axis=1)
+
+            meta = self.teaching_loads.reindex(self.df.index)
+            if len(meta.columns) and all(dtype.kind in "iuf" for dtype in meta.dtypes):
+                # a row of an all-numeric frame is upcast to a common dtype, keep that
+                meta = meta.astype(np.result_type(*meta.dtypes))
+            for col, default in self.load_meta_defaults.items():
+                if col not in meta.columns:
+                    meta[col] = default
+
+            expected = (
+                meta["Deputat 24/25"]
+                - meta["Anr"]
+                - meta["Bonus"]
+                - meta["Ags-Std"]
+                - meta["Poolstd-Std"]
+            )
+            table = meta.copy()
+            table["assigned"] = assigned  # WS
+            table["expected"] = expected  # Deputat Netto
+            table["delta"] = assigned - expected
+            self._load_table = table
+        return self._load_table
+
     def get_total_lessons(self, teacher):
         """
         Sum all non-null Stunden entries for this teacher
@@ -208,198 +363,252 @@ class TeacherSchedule:
         if teacher not in self.df.index:
             return 0
 
-        stunden_cols = [col for col in self.df.columns if col[1] == "Std"]
-        return (
-            pd.to_numeric(self.df.loc[teacher, stunden_cols], errors="coerce")
-            .fillna(0)
-            .sum()
-        )
+        return self.get_load_table().at[teacher, "assigned"]
 
-    
     def compare_load(self, teacher):
         """
         Return a summary of assigned vs expected load
         """
-        load = self.get_teaching_load(teacher)
-        for value in load.values():
-            if type(value) == str:
-                print('teacher:', teacher, 'value:', value)
-        actual = self.get_total_lessons(teacher)
-        expected = (
-            load.get("Deputat 24/25", 0)
-            - load.get("Anr", 0)
-            - load.get("Bonus", 0)
-            - load.get("Ags-Std", 0)
-            - load.get("Poolstd-Std", 0)
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            for value in self.get_teaching_load(teacher).values():
+                if type(value) == str:
+                    logger.debug("Teaching load of %s has a text value: %r", teacher, value)
 
+        if teacher not in self.df.index:
+            return {"teacher": teacher, "assigned": 0, "expected": 0, "delta": 0}
+
+        table = self.get_load_table()
         return {
             "teacher": teacher,
-            "assigned": actual, # WS
-            "expected": expected, # Deputat Netto
-            "delta": actual - expected,
+            "assigned": table.at[teacher, "assigned"],  # WS
+            "expected": table.at[teacher, "expected"],  # Deputat Netto
+            "delta": table.at[teacher, "delta"],
         }
 
     def get_classes(self):
         """Return list of all class names that have 'Fach' and 'Std' columns."""
         return sorted({col[0] for col in self.df.columns if col[1] == "Std"})
 
-    def get_teachers_in_class(self, class_name):
-        """Return teachers who teach in a given class."""
-        if (class_name, "Std") not in self.df.columns:
-            return []
+    def _melt_class_pairs(self, teachers=None, class_names=None):
+        """
+        Reshape the (class, Fach)/(class, Std) column pairs into one row per non-empty
+        Std cell with teacher, class, subject and hours. Rows are teacher-major with
+        classes sorted by name; teachers and class_names restrict the input first.
+        """
+        paired = {col[0] for col in self.df.columns if col[1] == "Fach"} & {
+            col[0] for col in self.df.columns if col[1] == "Std"
+        }
+        if class_names is not None:
+            paired &= set(class_names)
+        df = self.df if teachers is None else self.df[self.df.index.isin(teachers)]
+
+        columns = ["teacher", "class", "subject", "hours"]
+        if not paired or df.empty:
+            return pd.DataFrame({col: pd.Series(dtype=object) for col in columns})
+
+        # stack the pairs: (teachers, classes, [Fach, Std]) -> one row per teacher and class.
+        # object dtype keeps every cell value as it is (no int -> float promotion)
+        class_names = np.array(sorted(paired), dtype=object)
+        pairs = df[[(cls, field) for cls in class_names for field in ("Fach", "Std")]]
+        stacked = pairs.to_numpy(dtype=object).reshape(len(df) * len(class_names), 2)
+        keep = pd.notna(stacked[:, 1])
+        return pd.DataFrame(
+            {
+                "teacher": np.repeat(df.index.to_numpy(dtype=object), len(class_names))[keep],
+                "class": np.tile(class_names, len(df))[keep],
+                "subject": stacked[keep, 0],
+                "hours": stacked[keep, 1],
+            },
+            columns=columns,
+        )
 
-        mask = self.df[(class_name, "Std")].fillna(0).astype(float) > 0
-        subset = self.df.loc[
-            mask, [(class_name, "Fach"), (class_name, "Std")]
-        ].reset_index()
-        subset.columns = ["Lehrer", "Fach", "Std"]
-        return subset.to_dict(orient="records")
+    def get_assignments(self):
+        """
+        Return the sparse assignment index, built once per schedule:
+        'edges' holds one (teacher, class, subject, hours) row per non-empty Std cell,
+        teacher-major and with classes sorted by name; 'by_teacher' and 'by_class'
+        map a name to the positions of its edges.
+        """
+        if self._assignments is None:
+            edges = self._melt_class_pairs()
+            edges["positive"] = pd.to_numeric(edges["hours"], errors="coerce").to_numpy() > 0
+            self._assignments = self._index_assignments(edges)
+        return self._assignments
+
+    @staticmethod
+    def _index_assignments(edges):
+        positions = pd.Series(np.arange(len(edges)))
+        return {
+            "edges": edges,
+            # plain arrays keep single lookups free of pandas overhead
+            "columns": {col: edges[col].to_numpy() for col in edges.columns},
+            "by_teacher": positions.groupby(edges["teacher"].to_numpy(), sort=False).indices if len(edges) else {},
+            "by_class": positions.groupby(edges["class"].to_numpy(), sort=False).indices if len(edges) else {},
+        }
 
-    def get_classes_of_teacher(self, teacher_name):
-        """Return all classes where a given teacher teaches with subject and hours."""
-        if teacher_name not in self.df.index:
+    def _edges_for(self, mapping, name, fields):
+        """Yield the given fields of all edges with positive hours of a teacher or class."""
+        index = self.get_assignments()
+        positions = index[mapping].get(name)
+        if positions is None:
             return []
+        columns = index["columns"]
+        positions = positions[columns["positive"][positions]]
+        return zip(*(columns[field][positions] for field in fields))
 
-        result = []
-        for col in self.get_classes():
-            try:
-                subject = self.df.loc[teacher_name, (col, "Fach")]
-                hours = self.df.loc[teacher_name, (col, "Std")]
-                if pd.notna(hours) and float(hours) > 0:
-                    result.append({"Class": col, "Subject": subject, "Lessons": hours})
-            except KeyError:
-                continue
-        return result
-
-    def build_wide_class_table(self, sort):
-        
-        wide_df_list = []
-
-        for grade in self.grade_columns:
-            wide_df = dict()
-            class_blocks = []
-            max_rows = 0
-            for class_name in list(filter(lambda x: x.startswith(grade), self.class_columns)):  # self.class_columns:
-                fach_col = (class_name, "Fach")
-                stunden_col = (class_name, "Std")
-                main_teachers_for_class = self.class_teachers.get(class_name, {})
-                print(f"main_teachers_for_class: {main_teachers_for_class}")
-
+    def get_teachers_in_class(self, class_name):
+        """Return teachers who teach in a given class."""
+        return [
+            {"Lehrer": teacher, "Fach": subject, "Std": hours}
+            for teacher, subject, hours in self._edges_for("by_class", class_name, ("teacher", "subject", "hours"))
+        ]
 
-                # Skip if either column missing
-                if fach_col not in self.df.columns or stunden_col not in self.df.columns:
-                    continue
+    def get_classes_of_teacher(self, teacher_name):
+        """Return all classes where a given teacher teaches with subject and hours."""
+        return [
+            {"Class": cls, "Subject": subject, "Lessons": hours}
+            for cls, subject, hours in self._edges_for("by_teacher", teacher_name, ("class", "subject", "hours"))
+        ]
 
-                # Filter only teachers with lessons in that class
-                sub_df = self.df[self.df[stunden_col].notna()][
-                    [fach_col, stunden_col]
-                ].copy()
-                # sub_df = sub_df.rename(
-                #     columns={
-                #         fach_col: f"{class_name} – Fach",
-                #         stunden_col: f"{class_name} – Std",
-                #     }
-                # )
-                sub_df.columns = [f"{col[0]} – {col[1]}" for col in sub_df.columns]
-                sub_df.insert(0, f"{class_name} – Teacher", sub_df.index)
-
-                f = lambda col: np.argsort(index_natsorted(col.str.lower().str.normalize('NFD')))
-
-                if sort == "teacher":
-                    sub_df = sub_df.sort_values(by=f"{class_name} – Teacher", key=f).reset_index(drop=True)
-
-                elif sort == "fach":
-                    sub_df = sub_df.sort_values(by=f"{class_name} – Fach", key=f).reset_index(drop=True)
-
-                sub_df = sub_df.reset_index(drop=True)
-
-
-                # add main teachers
-                if main_teachers_for_class:     
-                    empty_row = ["", "", ""]               
-                    main_teacher_row = ["KL:", main_teachers_for_class.get("main"), ""]
-                    deputies = main_teachers_for_class.get("deputies")
-                    deputies_string = ", ".join(deputies)
-                    deputies_row = ["TP:", deputies_string, ""]
-                    new_rows = [empty_row, main_teacher_row, deputies_row]
-                    new_df = pd.DataFrame(new_rows, columns=sub_df.columns)
-                    sub_df = pd.concat([sub_df, new_df], ignore_index=True)
-
-                max_rows = max(max_rows, len(sub_df))
-                class_blocks.append(sub_df)
-
-            # Pad all blocks to the same number of rows
-            for i in range(len(class_blocks)):
-                block = class_blocks[i]
-                if len(block) < max_rows:
-                    # Add empty rows
-                    pad_size = max_rows - len(block)
-                    padding = pd.DataFrame(
-                        [[""] * block.shape[1]] * pad_size, columns=block.columns
+    def get_class_summary(self):
+        """
+        Return the per-grade class blocks behind the summary table, computed once.
+        Each block holds the (Teacher, Fach, Std) rows of a class, the natural sort
+        order of its rows for 'teacher' and 'fach' and the KL/TP footer rows.
+        """
+        if self._class_summary is None:
+            # natural-sort collation key: case-insensitive, accents after their base letter
+            collate = lambda col: col.str.lower().str.normalize('NFD')
+            summary = []
+
+            for grade in self.grade_columns:
+                blocks = []
+                for class_name in list(filter(lambda x: x.startswith(grade), self.class_columns)):
+                    fach_col = (class_name, "Fach")
+                    stunden_col = (class_name, "Std")
+                    main_teachers_for_class = self.class_teachers.get(class_name, {})
+                    logger.debug("Class teachers of %s: %s", class_name, main_teachers_for_class)
+
+                    # Skip if either column missing
+                    if fach_col not in self.df.columns or stunden_col not in self.df.columns:
+                        continue
+
+                    # Only teachers with lessons in that class, in sheet order
+                    rows = np.flatnonzero(self.df[stunden_col].notna().to_numpy())
+                    teacher_col = f"{class_name} – Teacher"
+                    sub_df = pd.DataFrame(
+                        {
+                            teacher_col: self.df.index.to_numpy(dtype=object)[rows],
+                            f"{class_name} – Fach": self.df[fach_col].to_numpy()[rows],
+                            f"{class_name} – Std": self.df[stunden_col].to_numpy()[rows],
+                        }
                     )
-                    class_blocks[i] = pd.concat([block, padding], ignore_index=True)
-
-               
-
-            # Concatenate all blocks side-by-side
-            wide_df['df'] = pd.concat(class_blocks, axis=1)
-            wide_df['grade'] = grade
-            wide_df_list.append(wide_df)
-        return wide_df_list
-
-    def get_dashboard_rows(self):
-        teacher_names = self.df.index.tolist()
-        rows = []
-
-        for name in teacher_names:
-            load = self.compare_load(name)
-            meta = self.get_teaching_load(name)
-            load["dep"] = meta.get("Deputat 24/25", 0)
-            load["anr"] = meta.get("Anr", 0)
-            load["bonus"] = meta.get("Bonus", 0)
-            load['ags'] = meta.get("Ags-Std", 0)
-            load['pool'] = meta.get("Poolstd-Std", 0)
-            load["teacher"] = name
-            rows.append(load)
-
-        return rows
-    
-    def get_teacher_schedule_long(self):
-        rows = []
-        df = self.df.copy()
-
-        # Index contains teacher names
-        teacher_names = df.index
-
-
-        # Get all class names by scanning second-level column headers
-        class_names = sorted(set([col[0] for col in df.columns if col[1] == "Fach"]))
 
-        for teacher in teacher_names:
-            row = df.loc[teacher]
-
-            for cls in class_names:
-                fach_col = (cls, "Fach")
-                std_col = (cls, "Std")
+                    # add main teachers
+                    footer = None
+                    if main_teachers_for_class:
+                        empty_row = ["", "", ""]
+                        main_teacher_row = ["KL:", main_teachers_for_class.get("main"), ""]
+                        deputies = main_teachers_for_class.get("deputies")
+                        deputies_string = ", ".join(deputies)
+                        deputies_row = ["TP:", deputies_string, ""]
+                        footer = pd.DataFrame([empty_row, main_teacher_row, deputies_row], columns=sub_df.columns)
+
+                    blocks.append(
+                        {
+                            "df": sub_df,
+                            "orders": {
+                                "teacher": index_natsorted(collate(sub_df[teacher_col])),
+                                "fach": index_natsorted(collate(sub_df[f"{class_name} – Fach"])),
+                            },
+                            "footer": footer,
+                        }
+                    )
+                summary.append({"grade": grade, "blocks": blocks})
+            self._class_summary = summary
+        return self._class_summary
 
-                if fach_col not in df.columns or std_col not in df.columns:
+    def build_wide_class_table(self, sort):
+        """
+        Return [{'grade': ..., 'df': ...}] with the classes of each grade side by side,
+        rows sorted by 'teacher' or 'fach'. Every sort order is assembled only once.
+        """
+        key = sort if sort in ("teacher", "fach") else None
+        if key not in self._wide_tables:
+            wide_df_list = []
+            for grade_summary in self.get_class_summary():
+                class_blocks = []
+                for block in grade_summary["blocks"]:
+                    sub_df = block["df"]
+                    if key is not None:
+                        sub_df = sub_df.iloc[block["orders"][key]].reset_index(drop=True)
+                    if block["footer"] is not None:
+                        sub_df = pd.concat([sub_df, block["footer"]], ignore_index=True)
+                    class_blocks.append(sub_df)
+                if not class_blocks:
                     continue
 
-                fach = row.get(fach_col)
-                stunden = row.get(std_col)
-
-                if pd.notna(stunden):
-                    rows.append({
-                        "Lehrer": teacher,
-                        "Klasse": cls,
-                        "Fach": fach,
-                        "Stunden": stunden,
-                    })
-
-        return pd.DataFrame(rows)
-    
-
-    
+                # Pad all blocks to the same number of rows
+                max_rows = max(len(block) for block in class_blocks)
+                for i in range(len(class_blocks)):
+                    block = class_blocks[i]
+                    if len(block) < max_rows:
+                        # Add empty rows
+                        pad_size = max_rows - len(block)
+                        padding = pd.DataFrame(
+                            [[""] * block.shape[1]] * pad_size, columns=block.columns
+                        )
+                        class_blocks[i] = pd.concat([block, padding], ignore_index=True)
+
+                # Concatenate all blocks side-by-side
+                wide_df_list.append({'df': pd.concat(class_blocks, axis=1), 'grade': grade_summary["grade"]})
+            self._wide_tables[key] = wide_df_list
+
+        # callers get their own list, the cached frames are shared and must not be modified
+        return [dict(wide_df) for wide_df in self._wide_tables[key]]
 
+    def get_dashboard_rows(self):
+        table = self.get_load_table()
+        rows = pd.DataFrame(
+            {
+                "teacher": table.index,
+                "assigned": table["assigned"].to_numpy(),
+                "expected": table["expected"].to_numpy(),
+                "delta": table["delta"].to_numpy(),
+                "dep": table["Deputat 24/25"].to_numpy(),
+                "anr": table["Anr"].to_numpy(),
+                "bonus": table["Bonus"].to_numpy(),
+                "ags": table["Ags-Std"].to_numpy(),
+                "pool": table["Poolstd-Std"].to_numpy(),
+            }
+        )
+        return rows.to_dict(orient="records")
 
+    def get_teacher_schedule_long(self, teacher=None, class_name=None, grade=None):
+        """
+        Return one row per teacher, class and subject with lessons (Lehrer, Klasse, Fach, Stunden),
+        optionally restricted to a teacher, a class and/or a grade.
+        """
+        if teacher is None and class_name is None and grade is None:
+            edges = self.get_assignments()["edges"]
+        else:
+            class_names = self.class_columns if grade is None else [
+                cls for cls in self.class_columns if cls.startswith(grade)
+            ]
+            if class_name is not None:
+                class_names = [cls for cls in class_names if cls == class_name]
+            edges = self._melt_class_pairs(
+                teachers=None if teacher is None else [teacher],
+                class_names=class_names,
+            )
+        if edges.empty:
+            return pd.DataFrame([])
+
+        return pd.DataFrame(
+            {
+                "Lehrer": edges["teacher"].tolist(),
+                "Klasse": edges["class"].tolist(),
+                "Fach": edges["subject"].tolist(),
+                "Stunden": edges["hours"].tolist(),
+            }
+        )
@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+
+from metrics import phase, count_cache
+
+
+class ScheduleCache:
+    """
+    Process-wide LRU cache of parsed TeacherSchedule objects.
+
+    Entries are keyed by file identity (real path, size, mtime), so a file that
+    is replaced on disk is loaded again even without explicit invalidation.
+    Misses are served from the binary snapshot of the workbook when it is fresh.
+
+    What gunicorn workers share is the parsing, not the memory: the upload
+    pipeline writes the snapshot once and every worker loads it without
+    reading Excel. Each worker then builds and keeps its own DataFrames, so
+    memory is per worker, up to max_entries schedules in each of them. The
+    snapshot holds mostly text (names, subjects, mixed hour values) that
+    pandas keeps as Python objects, which is why mapping it into memory
+    shared by the workers would not avoid those copies.
+
+    Uploads are never changed once stored, so entries can't go stale. Those
+    of uploads removed by garbage collection are no longer requested and
+    leave the cache like any other least recently used entry.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_key(filepath):
+        stat = os.stat(filepath)
+        return (os.path.realpath(filepath), stat.st_size, stat.st_mtime_ns)
+
+    def get(self, filepath):
+        """Return the parsed schedule for filepath, parsing it on a cache miss."""
+        with phase("load"):
+            return self._get(filepath)
+
+    def _get(self, filepath):
+        key = self.file_key(filepath)
+        with self._lock:
+            ts = self._entries.get(key)
+            if ts is not None:
+                self._entries.move_to_end(key)
+                count_cache("schedule", True)
+                return ts
+        count_cache("schedule", False)
+
+        # pandas comes with the snapshot module, a worker imports it with its first schedule
+        from snapshot import load_schedule
+
+        # load outside the lock, other requests keep being served meanwhile
+        ts = load_schedule(filepath)
+
+        with self._lock:
+            # drop older versions of the same file
+            for stale in [k for k in self._entries if k[0] == key[0] and k != key]:
+                del self._entries[stale]
+            self._entries[key] = ts
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return ts
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
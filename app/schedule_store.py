@@ -0,0 +1,196 @@
+import time
+import logging
+
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from cleaning import CLEANING_VERSION
+
+logger = logging.getLogger(__name__)
+
+# bump whenever the documents change, schedules are written again then. The documents
+# hold cleaned values, so schedules stored by another CLEANING_VERSION are written again too.
+STORE_VERSION = 1
+
+# a schedule that is still being written after this many seconds is assumed to be lost
+WRITE_TIMEOUT = 120
+
+BATCH_SIZE = 1000
+
+# fields of a teacher's load (dashboard row) and their load table columns
+LOAD_FIELDS = {
+    "assigned": "assigned",
+    "expected": "expected",
+    "delta": "delta",
+    "dep": "Deputat 24/25",
+    "anr": "Anr",
+    "bonus": "Bonus",
+    "ags": "Ags-Std",
+    "pool": "Poolstd-Std",
+}
+
+_indexed = set()
+
+
+def _plain(value):
+    """numpy scalars as the Python values BSON can encode."""
+    return value.item() if hasattr(value, "item") and not isinstance(value, (str, bytes)) else value
+
+
+def ensure_indexes(db):
+    """Create the indexes of the schedule collections once per process and database."""
+    if db.name in _indexed:
+        return
+    db.schedule_teachers.create_index([("schedule", ASCENDING), ("name", ASCENDING)], unique=True)
+    db.schedule_teachers.create_index([("schedule", ASCENDING), ("position", ASCENDING)])
+    db.schedule_classes.create_index([("schedule", ASCENDING), ("name", ASCENDING)], unique=True)
+    db.schedule_assignments.create_index([("schedule", ASCENDING), ("teacher", ASCENDING), ("position", ASCENDING)])
+    db.schedule_assignments.create_index([("schedule", ASCENDING), ("class", ASCENDING), ("position", ASCENDING)])
+    _indexed.add(db.name)
+
+
+def _insert_batches(collection, documents):
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == BATCH_SIZE:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+
+def _teacher_documents(schedule_id, ts):
+    table = ts.get_load_table()
+    for position, name in enumerate(table.index):
+        yield {
+            "schedule": schedule_id,
+            "name": name,
+            "position": position,
+            # the meta columns as they are in the workbook
+            "meta": {key: _plain(value) for key, value in ts.get_teaching_load(name).items()},
+            # assigned vs expected load, with defaults for missing meta columns
+            "load": {field: _plain(table.at[name, column]) for field, column in LOAD_FIELDS.items()},
+        }
+
+
+def _class_documents(schedule_id, ts):
+    for name, teachers in ts.class_teachers.items():
+        yield {
+            "schedule": schedule_id,
+            "name": name,
+            "main": teachers.get("main"),
+            "deputies": teachers.get("deputies", []),
+        }
+
+
+def _assignment_documents(schedule_id, ts):
+    columns = ts.get_assignments()["columns"]
+    for position, (teacher, cls, subject, hours) in enumerate(
+        zip(columns["teacher"], columns["class"], columns["subject"], columns["hours"])
+    ):
+        if columns["positive"][position]:
+            yield {
+                "schedule": schedule_id,
+                "teacher": teacher,
+                "class": cls,
+                "subject": _plain(subject),
+                "hours": _plain(hours),
+                "position": position,
+            }
+
+
+def delete_schedule(db, schedule_id):
+    for collection in (db.schedule_teachers, db.schedule_classes, db.schedule_assignments):
+        collection.delete_many({"schedule": schedule_id})
+    db.schedules.delete_one({"_id": schedule_id})
+
+
+def has_schedule(db, schedule_id):
+    """
+    True if the schedule is completely written by the current versions. Always asked
+    from the database, another worker may have removed the schedule since.
+    """
+    state = db.schedules.find_one(
+        {"_id": schedule_id, "state": "complete", "version": STORE_VERSION, "cleaning_version": CLEANING_VERSION},
+        {"_id": 1},
+    )
+    return state is not None
+
+
+def write_schedule(db, schedule_id, ts, wait=WRITE_TIMEOUT, interval=0.1):
+    """
+    Store a parsed schedule as teacher, class and assignment documents, unless it is stored already.
+    Only one process writes a schedule, the others wait for it to finish.
+    """
+    deadline = time.monotonic() + wait
+    while not has_schedule(db, schedule_id):
+        try:
+            db.schedules.insert_one({"_id": schedule_id, "state": "writing", "started": time.time()})
+        except DuplicateKeyError:
+            state = db.schedules.find_one({"_id": schedule_id}) or {}
+            outdated = state.get("state") == "complete" and (
+                state.get("version") != STORE_VERSION or state.get("cleaning_version") != CLEANING_VERSION
+            )
+            lost = state.get("state") == "writing" and time.time() - state.get("started", 0) > WRITE_TIMEOUT
+            if outdated or lost:
+                delete_schedule(db, schedule_id)
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"schedule {schedule_id} is still being written")
+            else:
+                time.sleep(interval)
+            continue
+
+        started = time.perf_counter()
+        try:
+            ensure_indexes(db)
+            for collection in (db.schedule_teachers, db.schedule_classes, db.schedule_assignments):
+                collection.delete_many({"schedule": schedule_id})
+            _insert_batches(db.schedule_teachers, _teacher_documents(schedule_id, ts))
+            _insert_batches(db.schedule_classes, _class_documents(schedule_id, ts))
+            _insert_batches(db.schedule_assignments, _assignment_documents(schedule_id, ts))
+        except Exception:
+            # leave nothing half written behind, the next request tries again
+            delete_schedule(db, schedule_id)
+            raise
+        done = {"state": "complete", "version": STORE_VERSION, "cleaning_version": CLEANING_VERSION, "written": time.time()}
+        db.schedules.update_one({"_id": schedule_id}, {"$set": done})
+        logger.info("Stored schedule %s in %.3f s", schedule_id, time.perf_counter() - started)
+
+
+def find_class(db, schedule_id, class_name):
+    """Teachers of a class (Lehrer, Fach, Std) plus its class teacher and deputies."""
+    records = [
+        {"Lehrer": doc["teacher"], "Fach": doc["subject"], "Std": doc["hours"]}
+        for doc in db.schedule_assignments.find(
+            {"schedule": schedule_id, "class": class_name}, {"_id": 0, "teacher": 1, "subject": 1, "hours": 1}
+        ).sort("position", ASCENDING)
+    ]
+    doc = db.schedule_classes.find_one({"schedule": schedule_id, "name": class_name}) or {}
+    return records, doc.get("main"), doc.get("deputies", [])
+
+
+def find_teacher(db, schedule_id, name):
+    """Classes of a teacher (Class, Subject, Lessons), the teaching load meta and assigned vs expected."""
+    records = [
+        {"Class": doc["class"], "Subject": doc["subject"], "Lessons": doc["hours"]}
+        for doc in db.schedule_assignments.find(
+            {"schedule": schedule_id, "teacher": name}, {"_id": 0, "class": 1, "subject": 1, "hours": 1}
+        ).sort("position", ASCENDING)
+    ]
+    doc = db.schedule_teachers.find_one({"schedule": schedule_id, "name": name}, {"meta": 1, "load": 1})
+    if doc is None:
+        return records, {}, {"teacher": name, "assigned": 0, "expected": 0, "delta": 0}
+    load = doc["load"]
+    compare = {"teacher": name, "assigned": load["assigned"], "expected": load["expected"], "delta": load["delta"]}
+    return records, doc["meta"], compare
+
+
+def dashboard_rows(db, schedule_id):
+    """Load of every teacher in the order of the workbook."""
+    return [
+        {"teacher": doc["name"], **doc["load"]}
+        for doc in db.schedule_teachers.find(
+            {"schedule": schedule_id}, {"_id": 0, "name": 1, "load": 1}
+        ).sort("position", ASCENDING)
+    ]
@@ -0,0 +1,224 @@
+import os
+import json
+import logging
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from schedule import TeacherSchedule
+from metrics import count_cache
+from utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+# layout of the snapshot file itself, independent of TeacherSchedule.CLEANING_VERSION
+SNAPSHOT_VERSION = 3
+SNAPSHOT_SUFFIX = ".snapshot.npz"
+
+# type codes for values of object columns
+_MISSING, _STR, _INT, _FLOAT, _BOOL = range(5)
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def snapshot_path(excel_path):
+    return f"{excel_path}{SNAPSHOT_SUFFIX}"
+
+
+def _source_signature(excel_path):
+    stat = os.stat(excel_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def _encode_values(key, values, arrays):
+    """
+    Store a 2-d block of values as type codes, text and numbers, so that
+    object columns mixing strings and numbers survive without pickling.
+    """
+    values = np.asarray(values, dtype=object)
+    kinds = np.full(values.shape, _MISSING, dtype=np.int8)
+    text = np.full(values.shape, "", dtype=object)
+    numbers = np.zeros(values.shape, dtype=np.float64)
+    for pos, value in np.ndenumerate(values):
+        if isinstance(value, str):
+            kinds[pos], text[pos] = _STR, value
+        elif isinstance(value, (bool, np.bool_)):
+            kinds[pos], numbers[pos] = _BOOL, value
+        elif isinstance(value, (int, np.integer)):
+            kinds[pos], numbers[pos] = _INT, value
+            if numbers[pos] != value:
+                raise SnapshotError(f"{key}: integer {value} does not fit into the snapshot")
+        elif isinstance(value, (float, np.floating)):
+            if not np.isnan(value):
+                kinds[pos], numbers[pos] = _FLOAT, value
+        elif value is not None:
+            raise SnapshotError(f"{key}: unsupported value {value!r} ({type(value).__name__})")
+
+    arrays[f"{key}/kinds"] = kinds
+    arrays[f"{key}/text"] = text.astype(str)
+    arrays[f"{key}/numbers"] = numbers
+
+
+def _decode_values(key, arrays):
+    kinds = arrays[f"{key}/kinds"]
+    values = np.full(kinds.shape, np.nan, dtype=object)
+    for kind, source, dtype in (
+        (_STR, arrays[f"{key}/text"], str),
+        (_INT, arrays[f"{key}/numbers"], np.int64),
+        (_FLOAT, arrays[f"{key}/numbers"], np.float64),
+        (_BOOL, arrays[f"{key}/numbers"], bool),
+    ):
+        mask = kinds == kind
+        if mask.any():
+            # tolist() turns numpy scalars into plain Python values
+            values[mask] = source[mask].astype(dtype).tolist()
+    return values
+
+
+def _encode_frame(prefix, df, arrays):
+    """Store a DataFrame as one block of values plus index, columns and dtypes."""
+    if df.empty and len(df.columns) == 0:
+        return {"empty": True}
+
+    index_name = df.index.name
+    dtypes = [str(dtype) for dtype in df.dtypes]
+    for dtype in dtypes:
+        if dtype != "object" and np.dtype(dtype).kind not in "biuf":
+            raise SnapshotError(f"{prefix}: unsupported column dtype {dtype}")
+
+    range_index = isinstance(df.index, pd.RangeIndex)
+    if not range_index:
+        _encode_values(f"{prefix}/index", df.index.to_numpy(dtype=object), arrays)
+    _encode_values(f"{prefix}/columns", np.array(df.columns.tolist(), dtype=object).reshape(len(df.columns), -1), arrays)
+    _encode_values(f"{prefix}/values", df.to_numpy(dtype=object), arrays)
+    return {
+        "empty": False,
+        "dtypes": dtypes,
+        "multiindex_columns": df.columns.nlevels > 1,
+        "index_name": list(index_name) if isinstance(index_name, tuple) else index_name,
+        "index_name_is_tuple": isinstance(index_name, tuple),
+        "range_index": [df.index.start, df.index.stop, df.index.step] if range_index else None,
+    }
+
+
+def _decode_frame(prefix, layout, arrays):
+    if layout["empty"]:
+        return pd.DataFrame()
+
+    index_name = layout["index_name"]
+    if layout["index_name_is_tuple"]:
+        index_name = tuple(index_name)
+    if layout.get("range_index"):
+        index = pd.RangeIndex(*layout["range_index"], name=index_name)
+    else:
+        index = pd.Index(_decode_values(f"{prefix}/index", arrays), name=index_name)
+
+    labels = _decode_values(f"{prefix}/columns", arrays)
+    if layout["multiindex_columns"]:
+        columns = pd.MultiIndex.from_tuples([tuple(label) for label in labels])
+    else:
+        columns = pd.Index(labels[:, 0])
+
+    values = _decode_values(f"{prefix}/values", arrays)
+    missing = arrays[f"{prefix}/values/kinds"] == _MISSING
+    numbers = np.where(missing, np.nan, arrays[f"{prefix}/values/numbers"])
+    data = {}
+    for i, dtype in enumerate(layout["dtypes"]):
+        # numeric columns come back with their original dtype
+        data[i] = values[:, i] if dtype == "object" else numbers[:, i].astype(dtype)
+    df = pd.DataFrame(data, index=index)
+    df.columns = columns
+    return df
+
+
+def write_snapshot(ts, path=None):
+    """
+    Write the cleaned state of a TeacherSchedule next to its workbook.
+    Returns the snapshot path, or None if the state can't be stored.
+    """
+    path = path or snapshot_path(ts.excel_path)
+    arrays = {}
+    try:
+        meta = {
+            "snapshot_version": SNAPSHOT_VERSION,
+            "cleaning_version": TeacherSchedule.CLEANING_VERSION,
+            "df": _encode_frame("df", ts.df, arrays),
+            "teaching_loads": _encode_frame("teaching_loads", ts.teaching_loads, arrays),
+            "class_teachers": ts.class_teachers,
+            "class_columns": ts.class_columns,
+            "header_index": [[lvl0, lvl1, pos] for (lvl0, lvl1), pos in ts.header_index.items()],
+        }
+        # derived tables, stored if they were computed before (see TeacherSchedule.precompute)
+        if ts._load_table is not None:
+            meta["load_table"] = _encode_frame("load_table", ts._load_table, arrays)
+        if ts._assignments is not None:
+            meta["assignment_edges"] = _encode_frame("assignment_edges", ts._assignments["edges"], arrays)
+        meta["wide_tables"] = [
+            {"sort": sort, "grade": table["grade"], "df": _encode_frame(f"wide_tables/{sort}/{i}", table["df"], arrays)}
+            for sort, tables in ts._wide_tables.items()
+            for i, table in enumerate(tables)
+        ]
+        arrays["meta"] = np.array(json.dumps(meta))
+    except (SnapshotError, TypeError) as e:
+        logger.warning("Snapshot of %s skipped: %s", ts.excel_path, e)
+        return None
+    arrays["source"] = _source_signature(ts.excel_path)
+
+    with atomic_write(path, "wb") as f:
+        np.savez(f, **arrays)
+    return path
+
+
+def read_snapshot(excel_path):
+    """Return the schedule stored in the snapshot, or None if it is missing or stale."""
+    path = snapshot_path(excel_path)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            arrays = {key: npz[key] for key in npz.files}
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    meta = json.loads(str(arrays["meta"]))
+    if (
+        meta.get("snapshot_version") != SNAPSHOT_VERSION
+        or meta.get("cleaning_version") != TeacherSchedule.CLEANING_VERSION
+        or not np.array_equal(arrays["source"], _source_signature(excel_path))
+    ):
+        return None
+
+    wide_tables = {}
+    for table in meta["wide_tables"]:
+        tables = wide_tables.setdefault(table["sort"], [])
+        prefix = f"wide_tables/{table['sort']}/{len(tables)}"
+        tables.append({"df": _decode_frame(prefix, table["df"], arrays), "grade": table["grade"]})
+
+    return TeacherSchedule.from_state(
+        excel_path,
+        df=_decode_frame("df", meta["df"], arrays),
+        teaching_loads=_decode_frame("teaching_loads", meta["teaching_loads"], arrays),
+        class_teachers=meta["class_teachers"],
+        class_columns=meta["class_columns"],
+        header_index={(lvl0, lvl1): pos for lvl0, lvl1, pos in meta["header_index"]},
+        load_table=_decode_frame("load_table", meta["load_table"], arrays) if "load_table" in meta else None,
+        assignment_edges=(
+            _decode_frame("assignment_edges", meta["assignment_edges"], arrays)
+            if "assignment_edges" in meta else None
+        ),
+        wide_tables=wide_tables,
+    )
+
+
+def load_schedule(excel_path):
+    """Load a schedule from its snapshot, parsing the workbook (and storing a fresh snapshot) if needed."""
+    ts = read_snapshot(excel_path)
+    count_cache("snapshot", ts is not None)
+    if ts is None:
+        ts = TeacherSchedule(excel_path)
+        write_snapshot(ts)
+    return ts
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import fcntl
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from utils import atomic_write
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+# extensions objects are stored with, the readers pick the engine by extension
+EXTENSIONS = ("xlsx", "xls")
+
+
+def is_digest(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def extension_of(filename):
+    return filename.rsplit(".", 1)[1].lower()
+
+
+class UploadStore:
+    """
+    Uploaded workbooks stored by content: objects/<sha256>.<extension> in folder,
+    with the extension of the uploaded file (xlsx or the legacy xls).
+
+    The same workbook uploaded twice, by one user or by several, is stored once
+    and shares its snapshot, cached schedule and export jobs, which are all
+    derived from the object. Objects are never changed after they are written.
+
+    Sessions only hold the digest. Which objects are still in use is recorded
+    per user in refs/, the newest versions_kept uploads of every user. Objects
+    no user refers to any more are removed by collect_garbage once they are
+    older than grace_period seconds, together with their snapshot and jobs.
+    """
+
+    def __init__(self, folder, versions_kept=3, grace_period=3600):
+        self.objects_folder = os.path.join(folder, "objects")
+        self.refs_folder = os.path.join(folder, "refs")
+        self.versions_kept = versions_kept
+        self.grace_period = grace_period
+        os.makedirs(self.objects_folder, exist_ok=True)
+        os.makedirs(self.refs_folder, exist_ok=True)
+
+    def path(self, digest, extension="xlsx"):
+        return os.path.join(self.objects_folder, f"{digest}.{extension}")
+
+    def exists(self, digest):
+        """True if the workbook is stored with any extension."""
+        return any(os.path.exists(self.path(digest, extension)) for extension in EXTENSIONS)
+
+    @contextmanager
+    def _locked(self):
+        # serializes adding references with garbage collection, across processes
+        with open(os.path.join(self.objects_folder, ".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _ref_path(self, user):
+        return os.path.join(self.refs_folder, hashlib.sha256(user.encode()).hexdigest() + ".json")
+
+    def _read_refs(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def _write_refs(self, path, refs):
+        with atomic_write(path) as f:
+            json.dump(refs, f)
+
+    def save(self, stream, user, filename, extension="xlsx"):
+        """
+        Write an upload to the store, hashing it while it is streamed to disk,
+        and record it as the newest upload of user. Returns the digest.
+        """
+        if extension not in EXTENSIONS:
+            raise ValueError(f"unsupported extension {extension!r}")
+        sha256 = hashlib.sha256()
+        tmp_path = os.path.join(self.objects_folder, f".upload{os.getpid()}.{threading.get_ident()}")
+        try:
+            with open(tmp_path, "wb") as f:
+                while chunk := stream.read(CHUNK_SIZE):
+                    sha256.update(chunk)
+                    f.write(chunk)
+            digest = sha256.hexdigest()
+
+            path = self.path(digest, extension)
+            with self._locked():
+                if os.path.exists(path):
+                    logger.info("Upload %s of %s is already stored", digest, filename)
+                else:
+                    os.replace(tmp_path, path)
+                    logger.info("Stored upload %s of %s", digest, filename)
+                ref_path = self._ref_path(user)
+                refs = [
+                    ref for ref in self._read_refs(ref_path)
+                    if (ref["sha256"], ref.get("extension", "xlsx")) != (digest, extension)
+                ]
+                refs.insert(0, {"sha256": digest, "extension": extension, "filename": filename, "added": time.time()})
+                self._write_refs(ref_path, refs[: self.versions_kept])
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return digest
+
+    def release(self, user, digest, extension="xlsx"):
+        """Forget an upload of user, e.g. one that could not be read."""
+        with self._locked():
+            ref_path = self._ref_path(user)
+            self._write_refs(ref_path, [
+                ref for ref in self._read_refs(ref_path)
+                if (ref["sha256"], ref.get("extension", "xlsx")) != (digest, extension)
+            ])
+
+    def referenced(self):
+        """(digest, extension) of the objects some user still refers to."""
+        objects = set()
+        for entry in os.scandir(self.refs_folder):
+            if entry.name.endswith(".json"):
+                objects.update((ref["sha256"], ref.get("extension", "xlsx")) for ref in self._read_refs(entry.path))
+        return objects
+
+    def collect_garbage(self, jobs=None):
+        """
+        Remove the objects no user refers to, with their snapshots, and the jobs
+        of jobs that were computed from them or have expired. Returns the digests
+        that are not stored with any extension any more.
+        """
+        from snapshot import snapshot_path
+
+        removed = set()
+        with self._locked():
+            referenced = self.referenced()
+            now = time.time()
+            for entry in os.scandir(self.objects_folder):
+                digest, _, extension = entry.name.partition(".")
+                if extension not in EXTENSIONS or not is_digest(digest) or (digest, extension) in referenced:
+                    continue
+                if now - entry.stat().st_mtime < self.grace_period:
+                    continue
+                snapshot = snapshot_path(entry.path)
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+                os.remove(entry.path)
+                removed.add(digest)
+            # the same content may still be stored with the other extension
+            removed = {digest for digest in removed if not self.exists(digest)}
+
+            if jobs is not None:
+                jobs.remove(lambda job: jobs.expired(job) or (
+                    is_digest(job.get("schedule")) and not self.exists(job["schedule"])
+                ))
+        if removed:
+            logger.info("Removed %d unreferenced uploads", len(removed))
+        return removed
@@ -0,0 +1,257 @@
+"""
+Benchmark TeacherSchedule and the exports on generated workbooks.
+
+For every size a workbook is generated (see generate_workbook.py) and each
+case is timed --repeat times. "cold" cases run on a fresh schedule without
+precomputed tables, "warm" ones repeat the call on the same schedule. The
+results are written as JSON; pass an earlier result file with --compare to
+print the change per case.
+
+    python benchmarks/bench_schedule.py --sizes 60 300 --output before.json
+    python benchmarks/bench_schedule.py --sizes 60 300 --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import functools
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARK_DIR, "..", "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_workbook import make_workbook  # noqa: E402
+
+# every size is a number of teachers, the other workbook parameters scale with it
+CLASSES_PER_GRADE = {60: 4, 150: 5, 300: 6}
+
+
+def timed(func, repeat):
+    """Run func repeat times, return the seconds of every run."""
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+    return seconds
+
+
+def fresh(ts):
+    """A copy of the cleaned schedule without any of its cached tables."""
+    from schedule import TeacherSchedule
+
+    return TeacherSchedule.from_state(
+        ts.excel_path, df=ts.df, teaching_loads=ts.teaching_loads, class_teachers=ts.class_teachers,
+        class_columns=ts.class_columns, header_index=ts.header_index,
+    )
+
+
+def cold(ts, method, *args):
+    """Time method on a fresh schedule each run, the copy is made outside the measurement."""
+    def run(repeat):
+        seconds = []
+        for _ in range(repeat):
+            schedule = fresh(ts)
+            start = time.perf_counter()
+            getattr(schedule, method)(*args)
+            seconds.append(time.perf_counter() - start)
+        return seconds
+    return run
+
+
+def warm(ts, method, *args):
+    getattr(ts, method)(*args)
+    return lambda repeat: timed(lambda: getattr(ts, method)(*args), repeat)
+
+
+@functools.cache
+def weasyprint_available():
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError):
+        return False
+    return True
+
+
+def flask_app():
+    """The app, with its uploads in a temporary folder unless UPLOAD_FOLDER is set."""
+    os.environ.setdefault("UPLOAD_FOLDER", tempfile.mkdtemp(prefix="bench-uploads-"))
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    from app import app
+
+    return app
+
+
+def csv_cases(path, ts):
+    """
+    The streamed CSV exports, requested through the views with a session that
+    works on path. The schedule is in the cache of the app before timing starts.
+    """
+    from flask import url_for
+
+    app = flask_app()
+    with open(path, "rb") as f:
+        digest = app.uploads.save(f, "benchmark", os.path.basename(path))
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session.update(username="benchmark", uploaded_sha256=digest, uploaded_extension="xlsx")
+
+    with app.test_request_context():
+        urls = {
+            "dashboard_csv": url_for("main.export_dashboard_csv"),
+            "class_csv": url_for("main.export_class_csv", cls=ts.get_classes()[0]),
+            "teacher_csv": url_for("main.export_teacher_csv", name=ts.get_df().index[0]),
+            "summary_csv": url_for("main.export_summary_csv", sort="teacher"),
+        }
+
+    def request(url):
+        response = client.get(url)
+        # the body is streamed, reading it runs the export
+        if response.status_code != 200 or not response.get_data():
+            raise RuntimeError(f"{url} answered {response.status_code}")
+
+    for name, url in urls.items():
+        request(url)
+        yield f"export/{name}", lambda repeat, url=url: timed(lambda: request(url), repeat)
+
+
+def pdf_case(path, ts):
+    """Render the summary PDF like the export view, None if WeasyPrint can't be loaded here."""
+    if not weasyprint_available():
+        return None
+    from flask import render_template
+    from exports import render_pdf
+
+    app = flask_app()
+
+    def run(repeat):
+        with app.test_request_context():
+            html = render_template("pdf_export.html", grade_tables=ts.build_wide_class_table("teacher"))
+        return timed(lambda: render_pdf(html), repeat)
+    return run
+
+
+def cases(path, ts):
+    """(name, function(repeat) -> seconds) of every benchmark for one workbook."""
+    from schedule import TeacherSchedule
+    from snapshot import write_snapshot, read_snapshot
+    from utils import iter_csv, dataframe_rows
+    import exports
+
+    identity = exports.schedule_identity(path)
+    precomputed = fresh(ts)
+    precomputed.precompute()
+    write_snapshot(precomputed)
+    long_df = ts.get_teacher_schedule_long()
+
+    yield "construct", lambda repeat: timed(lambda: TeacherSchedule(path), repeat)
+    yield "snapshot_load", lambda repeat: timed(lambda: read_snapshot(path), repeat)
+    yield "get_dashboard_rows/cold", cold(ts, "get_dashboard_rows")
+    yield "get_dashboard_rows/warm", warm(ts, "get_dashboard_rows")
+    for sort in ("teacher", "fach"):
+        yield f"build_wide_class_table[{sort}]/cold", cold(ts, "build_wide_class_table", sort)
+        yield f"build_wide_class_table[{sort}]/warm", warm(ts, "build_wide_class_table", sort)
+    yield "get_teacher_schedule_long/cold", cold(ts, "get_teacher_schedule_long")
+    yield "get_teacher_schedule_long/warm", warm(ts, "get_teacher_schedule_long")
+
+    # exports, on the schedule the export jobs keep loaded
+    exports.load_schedule_for_job(identity)
+    yield "export/teacher_load_xlsx", lambda repeat: timed(lambda: exports.teacher_load_export(identity), repeat)
+    yield "export/dashboard_xlsx", lambda repeat: timed(lambda: exports.dashboard_workbook(identity), repeat)
+    yield "export/summary_xlsx", lambda repeat: timed(lambda: exports.summary_workbook(identity, "teacher"), repeat)
+    yield "export/schedule_xlsx", lambda repeat: timed(lambda: exports.schedule_workbook(identity), repeat)
+    yield "export/schedule_csv", lambda repeat: timed(lambda: b"".join(iter_csv(dataframe_rows(long_df))), repeat)
+    yield from csv_cases(path, ts)
+    pdf = pdf_case(path, ts)
+    if pdf is not None:
+        yield "export/summary_pdf", pdf
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sizes, repeat, workdir, selected=None):
+    from schedule import TeacherSchedule
+
+    results = []
+    for teachers in sizes:
+        path = os.path.join(workdir, f"schedule_{teachers}.xlsx")
+        params = {"teachers": teachers, "classes_per_grade": CLASSES_PER_GRADE.get(teachers, 6)}
+        make_workbook(path, **params)
+        ts = TeacherSchedule(path)
+        for name, run in cases(path, ts):
+            if selected and not any(part in name for part in selected):
+                continue
+            seconds = run(repeat)
+            result = {
+                "case": name,
+                "workbook": params,
+                "runs": len(seconds),
+                "min": min(seconds),
+                "median": statistics.median(seconds),
+                "mean": statistics.fmean(seconds),
+            }
+            results.append(result)
+            print(f"{teachers:>5} teachers  {name:<40} median {result['median'] * 1000:9.2f} ms"
+                  f"  min {result['min'] * 1000:9.2f} ms")
+    return results
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r["case"], r["workbook"]["teachers"]): r for r in json.load(f)["results"]}
+    print(f"\ncompared to {baseline_path} (median):")
+    for result in results:
+        before = baseline.get((result["case"], result["workbook"]["teachers"]))
+        if before is None:
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        print(f"{result['workbook']['teachers']:>5} teachers  {result['case']:<40} "
+              f"{before['median'] * 1000:9.2f} -> {result['median'] * 1000:9.2f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[60, 300], help="numbers of teachers")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--case", action="append", help="only run cases whose name contains this (repeatable)")
+    parser.add_argument("--output", help="JSON result file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", help="earlier JSON result file to compare against")
+    args = parser.parse_args()
+
+    started = datetime.now(timezone.utc)
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        results = run_benchmarks(args.sizes, args.repeat, workdir, args.case)
+
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", started.strftime("%Y%m%dT%H%M%SZ.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({
+            "started": started.isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
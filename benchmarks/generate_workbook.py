@@ -0,0 +1,131 @@
+"""
+Write a synthetic schedule workbook in the format TeacherSchedule reads.
+
+Layout of the generated sheet:
+- row 1: class names (merged over their two columns) and the teacher meta
+  columns Deputat 24/25, Anr, Bonus, Sonderaufgaben, Ags, Poolstd
+- row 2: Fach/Std (5std LF, 3std BF, 2std BF for the KS courses) and the
+  sub headers of the meta columns
+- row 3: KL, the class teacher of every class
+- row 4: TP, the deputies of every class
+- a "Summe" row, one row per teacher ("Name, Vorname") and the usual
+  non-teacher rows at the end
+The class columns end with KS2 BF2, where TeacherSchedule stops reading classes.
+
+    python benchmarks/generate_workbook.py plan.xlsx --teachers 300 --classes-per-grade 6
+"""
+import string
+import random
+import argparse
+
+from openpyxl import Workbook
+
+GRADES = ["5", "6", "7", "8", "9", "10"]
+COURSES = [("LF1", "5std LF"), ("LF2", "5std LF"), ("BF1", "3std BF"), ("BF2", "2std BF")]
+SUBJECTS = ["D", "M", "E", "Bio", "Ch", "Ph", "Ge", "Ek", "Mu", "Ku", "Sp", "eth", "ev", "kath", "F", "L", "Inf", "NwT"]
+HOURS = [1, 2, 3, 4, 4.5, 5]
+
+
+def class_columns(classes_per_grade):
+    """(class, Fach header) of every class, the KS courses last and KS2 BF2 at the very end."""
+    columns = [(grade + letter, "Fach") for grade in GRADES for letter in string.ascii_lowercase[:classes_per_grade]]
+    columns += [(f"{level} {course}", header) for level in ("KS1", "KS2") for course, header in COURSES]
+    return columns
+
+
+def subject_names(variants):
+    """Subject codes, beyond the base list numbered variants like "M2" for course splits."""
+    names = SUBJECTS[:variants]
+    number = 2
+    while len(names) < variants:
+        names += [f"{subject}{number}" for subject in SUBJECTS][: variants - len(names)]
+        number += 1
+    return names
+
+
+def make_workbook(path, teachers=60, classes_per_grade=4, subject_variants=16, sparsity=0.88, seed=1):
+    """
+    Write the workbook to path. sparsity is the share of teacher/class cells
+    without lessons; a few cells get a subject without hours or 0 hours, like
+    real schedules do.
+    """
+    rnd = random.Random(seed)
+    classes = class_columns(classes_per_grade)
+    subjects = subject_names(subject_variants)
+    names = [f"Müller{i}, Änne{i}" for i in range(teachers)] + ["Zeta, Ole", "ähm, Bert"]
+    last_names = [name.split(",")[0] for name in names]
+
+    wb = Workbook()
+    ws = wb.active
+    header = ["Lehrer"]
+    sub_header = [None]
+    for name, fach in classes:
+        header += [name, None]
+        sub_header += [fach, "Std"]
+    header += [None, "Deputat 24/25", "Anr", "Bonus", "Sonderaufgaben", "Ags [unter Vorbehalt]", None,
+               "Poolstd [unter Vorbehalt]", None]
+    sub_header += [None, None, "Std", None, "Bg", "AG", "Std", "Bg", "Std"]
+    ws.append(header)
+    ws.append(sub_header)
+
+    class_teachers = ["KL"]
+    deputies = ["TP"]
+    for _ in classes:
+        class_teachers += [rnd.choice(last_names), None]
+        deputies += [", ".join(rnd.sample(last_names, 2)) if rnd.random() < 0.8 else None, None]
+    ws.append(class_teachers)
+    ws.append(deputies)
+    ws.append(["Summe"])
+
+    for name in names:
+        row = [name]
+        for _ in classes:
+            draw = rnd.random()
+            if draw >= sparsity:
+                row += [rnd.choice(subjects), rnd.choice(HOURS)]
+            elif draw < 0.02:
+                row += [rnd.choice(subjects), None]
+            elif draw < 0.04:
+                row += [None, 0]
+            else:
+                row += [None, None]
+        row += [
+            None,
+            rnd.choice([25, 12.5, 20, 23]),
+            rnd.choice([0, 1, 2, None]),
+            rnd.choice([None, 0.5, 1]),
+            rnd.choice([None, "SV", "Fachleitung Mathe"]),
+            rnd.choice([None, "Chor"]),
+            rnd.choice([None, 1, 2]),
+            rnd.choice([None, "Förder"]),
+            rnd.choice([None, 1]),
+        ]
+        ws.append(row)
+    ws.append(["Frei"])
+    ws.append([None])
+    ws.append(["Summe, "])
+
+    for i in range(len(classes)):
+        column = 2 + 2 * i
+        ws.merge_cells(start_row=1, start_column=column, end_row=1, end_column=column + 1)
+    wb.save(path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--teachers", type=int, default=60)
+    parser.add_argument("--classes-per-grade", type=int, default=4)
+    parser.add_argument("--subject-variants", type=int, default=16)
+    parser.add_argument("--sparsity", type=float, default=0.88)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    make_workbook(
+        args.path, teachers=args.teachers, classes_per_grade=args.classes_per_grade,
+        subject_variants=args.subject_variants, sparsity=args.sparsity, seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
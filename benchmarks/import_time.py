@@ -0,0 +1,94 @@
+"""
+Import-time budget for the web app.
+
+Imports app.py (what every gunicorn worker does on boot) in fresh interpreters
+with -X importtime, prints the slowest imports and fails if the median time
+exceeds the budget or if one of the lazily loaded export backends was imported.
+
+    python benchmarks/import_time.py [--budget-ms 800] [--runs 5]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# imported by the views and jobs that need them, never on worker boot
+LAZY_MODULES = ["pandas", "numpy", "openpyxl", "weasyprint", "pypdf"]
+
+PROBE = (
+    "import sys, json, time\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    f"print(json.dumps({{'seconds': elapsed, 'lazy': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+)
+
+
+def measure(env):
+    """Import the app once, return (seconds, eagerly imported lazy modules, {module: cumulative ms})."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=APP_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"importing app failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+
+    # "import time: self [us] | cumulative | imported package", nesting is indented by two
+    # spaces and children are listed before their parent, so the modules app imports
+    # directly are the first level entries right before the "app" line
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, raw_name = line[len("import time:"):].split("|")
+        name = raw_name.strip()
+        level = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if level == 0:
+            if name == "app":
+                break
+            imports = {}
+        elif level == 1:
+            imports[name] = int(cumulative_us) / 1000
+    return report["seconds"], report["lazy"], imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", 800)))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest imports to show")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    upload_folder = tempfile.mkdtemp(prefix="import-time-")
+    env.setdefault("UPLOAD_FOLDER", upload_folder)
+    env.setdefault("SECRET_KEY", "import-time")
+
+    runs = [measure(env) for _ in range(args.runs)]
+    median_ms = statistics.median(seconds for seconds, _, _ in runs) * 1000
+    lazy = sorted({module for _, modules, _ in runs for module in modules})
+
+    print(f"import app: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest imports of app.py (cumulative):")
+    _, _, imports = runs[-1]
+    for name, ms in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import takes {median_ms:.0f} ms, budget is {args.budget_ms:.0f} ms")
+        failed = True
+    if lazy:
+        print(f"FAIL: imported on boot although they should load lazily: {', '.join(lazy)}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
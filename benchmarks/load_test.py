@@ -0,0 +1,310 @@
+"""
+HTTP load test against a local gunicorn.
+
+Starts gunicorn with load_test_app (mongomock instead of MongoDB, unless
+MONGO_URI is set), logs in through the login form, uploads a generated
+workbook and then lets --users threads request a weighted mix of pages for
+--duration seconds. Prints p50/p95/p99 latency and throughput per route.
+
+    python benchmarks/load_test.py --users 20 --duration 30 --workers 4
+    python benchmarks/load_test.py --url http://127.0.0.1:5001 --mix dashboard=1,summary=1
+
+--url targets a server that is already running; its users collection needs
+the --username/--password account.
+
+Without MONGO_URI every gunicorn worker has its own mongomock database, so the
+schedules the dashboard, class and teacher pages read are written and read per
+worker. Set MONGO_URI to measure them on one shared MongoDB.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+import http.cookiejar
+import urllib.error
+import urllib.parse
+import urllib.request
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARK_DIR, "..", "app")
+sys.path.insert(0, BENCHMARK_DIR)
+
+from generate_workbook import make_workbook  # noqa: E402
+
+DEFAULT_MIX = "dashboard=4,class=3,teacher=3,summary=2,summary_sort=2,export_csv=1,export_xlsx=1,export_pdf=0"
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class Client:
+    """urllib opener with its own cookie jar, i.e. one browser session."""
+
+    def __init__(self, base_url, cookies=None):
+        self.base_url = base_url.rstrip("/")
+        self.cookies = http.cookiejar.CookieJar()
+        for cookie in cookies or []:
+            self.cookies.set_cookie(cookie)
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def request(self, path, data=None, headers=None):
+        """Return (status, final url, body), redirects are followed."""
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers or {})
+        try:
+            with self.opener.open(request, timeout=120) as response:
+                return response.status, response.url, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.url, e.read()
+
+
+def multipart(fields, files):
+    """Encode form fields and (name, filename, content, mimetype) files as multipart/form-data."""
+    boundary = f"----loadtest{random.getrandbits(64):x}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, content, mimetype in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {mimetype}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def log_in(client, username, password):
+    status, _, body = client.request("/login")
+    match = re.search(rb'name="csrf_token" type="hidden" value="([^"]+)"', body) or \
+        re.search(rb'name="csrf_token" value="([^"]+)"', body)
+    fields = {"username": username, "password": password, "submit": "Login"}
+    if match:
+        fields["csrf_token"] = match.group(1).decode()
+    status, url, body = client.request("/login", data=urllib.parse.urlencode(fields).encode())
+    if urllib.parse.urlparse(url).path == "/login":
+        sys.exit(f"login as {username} failed (HTTP {status})")
+
+
+def upload(client, path, timeout=300):
+    """Upload the workbook and follow the ingestion progress until the dashboard is reached."""
+    with open(path, "rb") as f:
+        body, content_type = multipart({}, [("file", os.path.basename(path), f.read(), XLSX_MIMETYPE)])
+    start = time.perf_counter()
+    status, url, _ = client.request("/upload", data=body, headers={"Content-Type": content_type})
+    while urllib.parse.urlparse(url).path.startswith("/upload/"):
+        if time.perf_counter() - start > timeout:
+            sys.exit("the upload was not processed in time")
+        time.sleep(0.2)
+        status, url, _ = client.request(urllib.parse.urlparse(url).path)
+    if urllib.parse.urlparse(url).path != "/dashboard":
+        sys.exit(f"upload failed, ended at {url} (HTTP {status})")
+    return time.perf_counter() - start
+
+
+def schedule_names(client):
+    """Class and teacher names as linked from the start page."""
+    _, _, body = client.request("/start")
+    html = body.decode()
+    classes = [urllib.parse.unquote(name) for name in re.findall(r'href="/class/([^"]+)"', html)]
+    teachers = [urllib.parse.unquote(name) for name in re.findall(r'href="/teacher/([^"/]+)"', html)]
+    if not classes or not teachers:
+        sys.exit("no classes or teachers found on /start")
+    return classes, teachers
+
+
+def route_requests(classes, teachers):
+    """Route name -> function(rng) returning (path, headers) of one request."""
+    quote = urllib.parse.quote
+    htmx = {"HX-Request": "true"}
+    return {
+        "dashboard": lambda rng: ("/dashboard", {}),
+        "class": lambda rng: (f"/class/{quote(rng.choice(classes))}", {}),
+        "teacher": lambda rng: (f"/teacher/{quote(rng.choice(teachers))}", {}),
+        "summary": lambda rng: ("/summary", {}),
+        # the sort buttons of the summary page swap the table through htmx
+        "summary_sort": lambda rng: (f"/summary?sort={rng.choice(['teacher', 'fach'])}", htmx),
+        "export_csv": lambda rng: (rng.choice([
+            "/export/dashboard/csv", f"/export/class/{quote(rng.choice(classes))}.csv", "/summary/export/teacher",
+        ]), {}),
+        "export_xlsx": lambda rng: (rng.choice([
+            "/export/dashboard/excel", "/summary/export/excel/?sort=teacher", "/export/schedule.xlsx",
+        ]), {}),
+        "export_pdf": lambda rng: ("/summary/export/pdf?sort=teacher", {}),
+    }
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(","):
+        name, weight = item.split("=")
+        mix[name.strip()] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def run_user(client, routes, mix, deadline, seed, samples, lock):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        route = rng.choices(names, weights)[0]
+        path, headers = routes[route](rng)
+        start = time.perf_counter()
+        try:
+            status, _, _ = client.request(path, headers=headers)
+        except (OSError, urllib.error.URLError):
+            status = 0
+        elapsed = time.perf_counter() - start
+        with lock:
+            samples.append((route, status, elapsed))
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def report(samples, duration):
+    rows = []
+    for route in sorted({route for route, _, _ in samples}):
+        latencies = sorted(elapsed for name, _, elapsed in samples if name == route)
+        errors = sum(1 for name, status, _ in samples if name == route and not 200 <= status < 400)
+        rows.append({
+            "route": route,
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput": len(latencies) / duration,
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": statistics.fmean(latencies),
+        })
+
+    print(f"\n{'route':<14} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for row in rows:
+        print(f"{row['route']:<14} {row['requests']:>8} {row['errors']:>6} {row['throughput']:>8.1f} "
+              f"{row['p50'] * 1000:>9.1f} {row['p95'] * 1000:>9.1f} {row['p99'] * 1000:>9.1f}")
+    total = len(samples)
+    print(f"{'total':<14} {total:>8} {sum(r['errors'] for r in rows):>6} {total / duration:>8.1f}")
+    return rows
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def mongo_warning(args):
+    """Warning for runs whose workers don't share a database, None if they do."""
+    if args.url is None and args.workers > 1 and not os.getenv("MONGO_URI"):
+        return (f"warning: MONGO_URI is not set, each of the {args.workers} workers stores and reads "
+                f"the schedule in its own mongomock database, not in one shared MongoDB")
+    return None
+
+
+def start_gunicorn(args, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        UPLOAD_FOLDER=os.path.join(workdir, "uploads"),
+        SECRET_KEY=os.getenv("SECRET_KEY", "load-test"),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+        LOAD_TEST_USER=args.username,
+        LOAD_TEST_PASSWORD=args.password,
+        PYTHONPATH=os.pathsep.join([APP_DIR, BENCHMARK_DIR, os.getenv("PYTHONPATH", "")]),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--workers", str(args.workers), "--threads", str(args.threads),
+         "--bind", f"127.0.0.1:{port}", "load_test_app:app"],
+        cwd=APP_DIR, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            sys.exit("gunicorn exited during startup")
+        try:
+            urllib.request.urlopen(base_url + "/login", timeout=1).close()
+            return server, base_url
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    sys.exit("gunicorn did not start within 60 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="use a running server instead of starting gunicorn")
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=1, help="gunicorn threads per worker")
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=20, help="seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route weights (default {DEFAULT_MIX})")
+    parser.add_argument("--teachers", type=int, default=150, help="size of the uploaded workbook")
+    parser.add_argument("--workbook", help="upload this workbook instead of a generated one")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    warning = mongo_warning(args)
+    if warning:
+        print(warning, file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="load-test-") as workdir:
+        server = None
+        base_url = args.url
+        if base_url is None:
+            server, base_url = start_gunicorn(args, workdir)
+        try:
+            workbook = args.workbook or make_workbook(os.path.join(workdir, "Plan.xlsx"), teachers=args.teachers)
+
+            client = Client(base_url)
+            log_in(client, args.username, args.password)
+            print(f"upload processed in {upload(client, workbook):.2f} s")
+            classes, teachers = schedule_names(client)
+            routes = route_requests(classes, teachers)
+            unknown = set(mix) - set(routes)
+            if unknown:
+                sys.exit(f"unknown routes in --mix: {', '.join(sorted(unknown))}")
+
+            # all users share the logged-in session with the uploaded plan, each with its own cookie jar
+            samples, lock = [], threading.Lock()
+            start = time.perf_counter()
+            threads = [
+                threading.Thread(target=run_user, args=(
+                    Client(base_url, list(client.cookies)), routes, mix, start + args.duration,
+                    args.seed + i, samples, lock,
+                ))
+                for i in range(args.users)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duration = time.perf_counter() - start
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    rows = report(samples, duration)
+    if warning:
+        print(f"\n{warning}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "users": args.users, "duration": duration, "mix": mix, "workers": args.workers,
+                "threads": args.threads, "teachers": args.teachers, "shared_mongo": warning is None,
+                "routes": rows,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
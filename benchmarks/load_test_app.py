@@ -0,0 +1,28 @@
+"""
+WSGI entry point for load tests: the app with mongomock instead of MongoDB.
+
+Started by load_test.py as `gunicorn load_test_app:app` with app/ and
+benchmarks/ on the path. Each worker seeds its own in-memory users collection
+with the LOAD_TEST_USER / LOAD_TEST_PASSWORD account, and stores the schedules
+it serves in its own database as well (load_test.py warns about that with
+several workers). With MONGO_URI set the real database is used and the account
+has to exist there.
+"""
+import os
+
+from werkzeug.security import generate_password_hash
+
+from app import app
+
+if not os.getenv("MONGO_URI"):
+    import types
+    import mongomock
+
+    # views only use current_app.mongo.db
+    app.mongo = types.SimpleNamespace(db=mongomock.MongoClient().teacherapp)
+    app.mongo.db.users.insert_one({
+        "username": os.getenv("LOAD_TEST_USER", "loadtest"),
+        # few iterations, logging in should not dominate the measurement
+        "password": generate_password_hash(os.getenv("LOAD_TEST_PASSWORD", "loadtest"), method="pbkdf2:sha256:1000"),
+        "role": "admin",
+    })